@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""
+Frame times of the game view, on the frames where a turn or a reaction changes and on the frames in between.
+
+The view is driven offscreen with the state events the server would send for a few games, every frame applies the
+events received since the previous one and draws the view. The time the view takes to apply the events is reported
+on its own, the drawing depends on the GPU, or on the software renderer of a headless machine. The script exits with
+status 1 when the median time to apply the events of a frame is over the target. Run with
+`python benchmarks/bench_game_view.py`, no display is needed.
+"""
+
+import argparse
+import pathlib
+import statistics
+import sys
+import time
+
+import pyglet
+
+# the window is never shown, the view is drawn in an offscreen context
+pyglet.options["headless"] = True
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+from chemistry import ReactionDeck  # noqa: E402
+from config import (  # noqa: E402
+    MAX_ROUNDS, ROOM_SIZE, SCREEN_HEIGHT, SCREEN_TITLE, SCREEN_WIDTH
+)
+from protocol import decode_json, encode_json  # noqa: E402
+from server import VersionedState  # noqa: E402
+from window import Window  # noqa: E402
+from window.views import Game  # noqa: E402
+
+# milliseconds the view may take to apply the events of a frame where a turn or a reaction changes, median
+UPDATE_TARGET = 6.0
+# frames drawn without any change after each event
+IDLE_FRAMES = 3
+PLAYERS = {f"player-{seat}": f"Player {seat}" for seat in range(ROOM_SIZE)}
+
+
+def game_events(seed: int) -> list[list[dict]]:
+    """The state events a player gets in one game, grouped by the server event they follow."""
+    deck = ReactionDeck(seed)
+    state = VersionedState(encode_json)
+
+    def fields(reaction, round_number, turn, parts):
+        return {"state": "playing", "players": PLAYERS, "round": round_number, "turn": turn, "won": 0,
+                "reaction": reaction.key if reaction else None, "variant": seed,
+                "parts": {str(position): part for position, part in enumerate(parts)
+                          if part != reaction.parts[position]}}
+
+    reaction = deck.draw()
+    state.update(fields(reaction, 0, 0, reaction.parts))
+    groups = [[decode_json(state.snapshot())]]
+    for round_number in range(MAX_ROUNDS):
+        parts = list(reaction.parts)
+        for turn in range(1, ROOM_SIZE + 1):
+            options = reaction.options(turn - 1, seed)
+            parts[turn - 1] = options[turn % len(options)]
+            groups.append([decode_json(state.update(fields(reaction, round_number, turn, parts)))])
+        if round_number + 1 < MAX_ROUNDS:
+            reaction = deck.draw()
+            groups[-1].append(decode_json(state.update(fields(reaction, round_number + 1, 0, reaction.parts))))
+    return groups
+
+
+def frame(main_window: Window, view: Game, events: list[dict]) -> tuple[float, float]:
+    """Milliseconds to apply `events`, and to also draw the view until the frame is finished on the GPU."""
+    start = time.perf_counter()
+    for event in events:
+        view.on_server_event(event)
+    applied = time.perf_counter()
+    view.on_draw()
+    main_window.ctx.finish()
+    return (applied - start) * 1000, (time.perf_counter() - start) * 1000
+
+
+def percentile(times: list[float], fraction: float) -> float:
+    """Time under which `fraction` of `times` are."""
+    times = sorted(times)
+    return times[min(len(times) - 1, int(len(times) * fraction))]
+
+
+def main():
+    """Print the frame times of a few games and fail if applying their events misses the target."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=20, help="number of games played")
+    parser.add_argument("--target", type=float, default=UPDATE_TARGET,
+                        help="milliseconds the median time to apply the events of a frame must stay under")
+    args = parser.parse_args()
+
+    main_window = Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    main_window.assets.load_fonts()
+    while main_window.assets.loading:
+        time.sleep(0.01)
+
+    updates, transitions, idle = [], [], []
+    for seed in range(args.games):
+        view = Game(main_window, PLAYERS, "Player 0", "player-0", f"room-{seed}")
+        for events in game_events(seed):
+            update, total = frame(main_window, view, events)
+            updates.append(update)
+            transitions.append(total)
+            idle.extend(frame(main_window, view, [])[1] for _ in range(IDLE_FRAMES))
+        if view.manager:
+            view.manager.disable()
+    main_window.close()
+
+    for name, times in (("events applied", updates), ("frames with a change", transitions),
+                        ("frames without change", idle)):
+        print(f"{name:<22} median {statistics.median(times):6.2f}ms  p95 {percentile(times, 0.95):6.2f}ms  "
+              f"max {max(times):7.2f}ms  ({len(times)} frames)")
+
+    median = statistics.median(updates)
+    print(f"\nmedian {median:.2f}ms to apply the events of a frame, target {args.target:.2f}ms")
+    if median > args.target:
+        print("update time over target")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+"""
+Check of the cold import of the client: time to import `main` with `-X importtime`, against a budget.
+
+Every run imports `main` in a new interpreter, the median of its cumulative import time is compared to the budget and
+the script exits with status 1 when it is over, or when a module only the game views need is imported with the menu.
+Run with `python benchmarks/bench_imports.py`, no display is needed.
+"""
+
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+
+SRC_PATH = pathlib.Path(__file__).resolve().parent.parent / "src"
+# milliseconds the cold import of main may take, most of it is arcade itself
+IMPORT_BUDGET = 450
+# modules imported when the game views are first shown, never with the menu
+DEFERRED = ("asyncio", "chemistry", "protocol", "webbrowser", "websockets", "window.network", "window.views")
+
+
+def import_times() -> dict[str, tuple[int, int]]:
+    """(level, cumulative microseconds) of every module imported by `main`, in a new interpreter."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=SRC_PATH,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    # import time: self [us] | cumulative | imported package, nested imports are indented by 2 spaces per level
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (level, int(cumulative))
+    return modules
+
+
+def main():
+    """Print the cold import time of every run and fail if their median is over budget."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="number of times main is imported")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET,
+                        help="milliseconds the median import time of main must stay under")
+    args = parser.parse_args()
+
+    runs = []
+    for run in range(args.runs):
+        modules = import_times()
+        runs.append(modules["main"][1] / 1000)
+        print(f"run {run + 1}: main imported in {runs[-1]:.1f}ms")
+
+    heaviest = sorted(((cumulative, name) for name, (level, cumulative) in modules.items() if level == 1),
+                      reverse=True)
+    print("\nheaviest imports of main:")
+    for cumulative, name in heaviest[:5]:
+        print(f"  {name:<30} {cumulative / 1000:>8.1f}ms")
+
+    failed = False
+    if deferred := [name for name in DEFERRED if name in modules]:
+        print("\nimported with the menu:", ", ".join(deferred))
+        failed = True
+    median = statistics.median(runs)
+    print(f"\nmedian {median:.1f}ms, budget {args.budget:.1f}ms")
+    if median > args.budget:
+        print("import time over budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
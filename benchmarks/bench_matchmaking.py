@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of public matchmaking: time taken to seat a player for a growing number of live rooms.
+
+Run with `python benchmarks/bench_matchmaking.py`.
+"""
+
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+
+from config import ROOM_SIZE  # noqa: E402
+from server import MatchmakingIndex  # noqa: E402
+
+LIVE_ROOMS = (100, 1_000, 10_000, 100_000)
+JOINS = 50_000
+
+
+def build_index(live_rooms: int) -> MatchmakingIndex:
+    """Index with `live_rooms` rooms, a random part of them still waiting for players."""
+    index = MatchmakingIndex(ROOM_SIZE)
+    for room_number in range(live_rooms):
+        index.add(f"room-{room_number}", random.randint(0, ROOM_SIZE - 1))
+    return index
+
+
+def bench_joins(index: MatchmakingIndex, joins: int) -> float:
+    """Average time in nanoseconds to seat one player, opening a room when none has a free seat."""
+    new_rooms = 0
+    start = time.perf_counter_ns()
+    for _ in range(joins):
+        room_key = index.claim()
+        if room_key is None:
+            index.add(f"new-room-{new_rooms}", ROOM_SIZE - 1)
+            new_rooms += 1
+        elif random.random() < 0.1:
+            # some waiting players leave again
+            index.release(room_key)
+    return (time.perf_counter_ns() - start) / joins
+
+
+def main():
+    """Print the join latency for every number of live rooms."""
+    random.seed(0)
+    print(f"{'live rooms':>12} {'ns / join':>12}")
+    for live_rooms in LIVE_ROOMS:
+        index = build_index(live_rooms)
+        print(f"{live_rooms:>12} {bench_joins(index, JOINS):>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the multi-process server: rooms played per second for a growing number of worker processes.
+
+Every run starts `python src/server.py --workers N` and plays games against it with several load tester processes at
+once, so the bots don't become the bottleneck. Run with `python benchmarks/bench_sharding.py`, the speedup can't
+exceed the number of cores of the machine.
+"""
+
+import argparse
+import os
+import pathlib
+import re
+import socket
+import subprocess
+import sys
+import time
+
+SRC_PATH = pathlib.Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_PATH))
+
+from config import ROOM_SIZE, SERVER_PORT  # noqa: E402
+
+FINISHED = re.compile(r"(\d+) players finished their game")
+
+
+def accepts_connections(port: int) -> bool:
+    """Whether a server listens on the port."""
+    try:
+        socket.create_connection(("localhost", port), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+
+def wait_for_port(port: int, accepting: bool = True, timeout: float = 10) -> None:
+    """Wait until the server accepts connections, or until it stopped accepting them."""
+    deadline = time.monotonic() + timeout
+    while accepts_connections(port) != accepting:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"port {port} still {'closed' if accepting else 'open'} after {timeout}s")
+        time.sleep(0.1)
+
+
+def bench_workers(workers: int, swarms: int, bots: int, private: float) -> float:
+    """Rooms played per second by a server of `workers` processes, against `swarms` load testers of `bots` bots."""
+    server = subprocess.Popen([sys.executable, "server.py", "--workers", str(workers)], cwd=SRC_PATH,
+                              stdout=subprocess.DEVNULL)
+    try:
+        wait_for_port(SERVER_PORT)
+        start = time.perf_counter()
+        testers = [
+            subprocess.Popen([sys.executable, "-m", "server.loadtest", "--bots", str(bots), "--private", str(private),
+                              "--seed", str(swarm)], cwd=SRC_PATH, stdout=subprocess.PIPE, text=True)
+            for swarm in range(swarms)
+        ]
+        players = sum(int(FINISHED.search(tester.communicate()[0]).group(1)) for tester in testers)
+        return players / ROOM_SIZE / (time.perf_counter() - start)
+    finally:
+        server.terminate()
+        server.wait()
+        wait_for_port(SERVER_PORT, accepting=False)
+
+
+def main():
+    """Print the rooms per second and the speedup for every number of workers."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="numbers of workers to compare")
+    parser.add_argument("--swarms", type=int, default=os.cpu_count(), help="load tester processes per run")
+    parser.add_argument("--bots", type=int, default=200, help="bots per load tester")
+    parser.add_argument("--private", type=float, default=0.5, help="fraction of the rooms that are private")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.swarms} load testers of {args.bots} bots\n")
+    print(f"{'workers':>8} {'rooms / s':>12} {'speedup':>10}")
+    single = None
+    for workers in args.workers:
+        rooms_per_second = bench_workers(workers, args.swarms, args.bots, args.private)
+        single = single or rooms_per_second
+        print(f"{workers:>8} {rooms_per_second:>12.1f} {rooms_per_second / single:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+"""
+Check of the startup of the client: time from launching it to its first frame, against a target.
+
+Every run starts `python src/main.py --exit-after-first-frame` and times it until it prints that the first frame was
+drawn, the median of the runs is compared to the target and the script exits with status 1 when it is slower. Run
+with `python benchmarks/bench_startup.py`, it needs a display.
+"""
+
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+SRC_PATH = pathlib.Path(__file__).resolve().parent.parent / "src"
+# seconds from launching the client to its first frame
+FIRST_FRAME_TARGET = 1.5
+
+
+def time_to_first_frame(timeout: float) -> float:
+    """Seconds from launching the client to its first frame."""
+    start = time.perf_counter()
+    client = subprocess.Popen([sys.executable, "main.py", "--exit-after-first-frame"], cwd=SRC_PATH,
+                              stdout=subprocess.PIPE, text=True)
+    # a client stuck before its first frame is killed, which ends its output
+    watchdog = threading.Timer(timeout, client.kill)
+    watchdog.start()
+    try:
+        for line in client.stdout:
+            if line.startswith("first frame drawn"):
+                return time.perf_counter() - start
+        raise RuntimeError("the client exited or timed out before drawing its first frame")
+    finally:
+        watchdog.cancel()
+        client.kill()
+        client.wait()
+
+
+def main():
+    """Print the time to the first frame of every run and fail if their median misses the target."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="number of times the client is started")
+    parser.add_argument("--target", type=float, default=FIRST_FRAME_TARGET,
+                        help="seconds the median time to the first frame must stay under")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds a run gets to draw its first frame")
+    args = parser.parse_args()
+
+    runs = []
+    for run in range(args.runs):
+        runs.append(time_to_first_frame(args.timeout))
+        print(f"run {run + 1}: first frame after {runs[-1]:.3f}s")
+
+    median = statistics.median(runs)
+    print(f"\nmedian {median:.3f}s, target {args.target:.3f}s")
+    if median > args.target:
+        print("time to first frame over target")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+
+"""
+Offline microbenchmarks of the chemistry module and of the event dispatch of the server.
+
+Nothing goes over the network, the server handler is driven with in-memory fake websockets. The results are written
+to a json file and compared to `benchmarks/baseline.json`, the script exits with status 1 when a benchmark got slower
+than the baseline by more than the tolerance.
+
+Run with `python benchmarks/microbench.py`, add `--update-baseline` to store the results as the new baseline.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import itertools
+import json
+import pathlib
+import sys
+import tempfile
+import timeit
+from typing import Callable
+
+BENCHMARKS_PATH = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_PATH.parent / "src"))
+
+from chemistry import ReactionDeck, get_reaction  # noqa: E402
+from config import ROOM_SIZE, SRC_PATH  # noqa: E402
+from protocol import (  # noqa: E402
+    BACKEND, decode_event, decode_json, encode_json
+)
+from server import RateLimiter, RoomStore, SQLiteRoomStore  # noqa: E402
+
+BASELINE = BENCHMARKS_PATH / "baseline.json"
+HANDLER_EVENTS = 2_000
+NOISE_FLOOR = 100
+# frames a client may send, each must be decoded or rejected with a ValueError, anything else closes the connection
+MALFORMED = (
+    'not json',
+    '[]',
+    '{"type": ["ping"]}',
+    '{"type": "unknown"}',
+    '{"type": "ping", "self": 1}',
+    '{"type": "room_status", "room": null}',
+    '{"type": "select_option_pub", "room": "room", "index": true, "option": "H", "turn": 1}',
+)
+
+
+def load_server():
+    """Import src/server.py, its name is shadowed by the `server` package."""
+    spec = importlib.util.spec_from_file_location("chemystery_server", SRC_PATH / "server.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeWebSocket:
+    """
+    In-memory stand-in for a server side websocket, it yields `messages` and keeps what is sent to it.
+
+    :param before: Called before every message is yielded, e.g. to put the room back in the state the message needs.
+    """
+
+    remote_address = ("127.0.0.1", 0)
+    # the client closes every connection normally, no seat is held for it
+    close_code = 1000
+
+    def __init__(self, messages: list[str] = (), before: Callable[[], None] = None):
+        self.messages = messages
+        self.before = before
+        self.sent = 0
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for message in self.messages:
+            if self.before:
+                self.before()
+            yield message
+
+    async def send(self, message) -> None:
+        """Count the message instead of sending it."""
+        self.sent += 1
+
+    async def close(self) -> None:
+        """Nothing to close."""
+
+
+def check_malformed() -> list[str]:
+    """The malformed frames decoding raises another error than a ValueError for, as printable lines."""
+    failures = []
+    for frame in MALFORMED:
+        try:
+            decode_event(frame)
+        except ValueError:
+            pass
+        except Exception as e:
+            failures.append(f"{frame}: {type(e).__name__}: {e}")
+    return failures
+
+
+def best_time(function, repeat: int = 5) -> float:
+    """Best time in nanoseconds of one call to `function`."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+def bench_chemistry() -> dict[str, float]:
+    """Time the reaction catalog and its presentations."""
+    reaction = get_reaction()
+    deck = ReactionDeck(0)
+    return {
+        "chemistry.get_reaction": best_time(get_reaction),
+        "chemistry.ReactionDeck.draw": best_time(deck.draw),
+        "chemistry.Reaction.json": best_time(lambda: reaction.json(1)),
+        "chemistry.Reaction.omit": best_time(lambda: reaction.omit(1)),
+        "chemistry.Reaction.omit_parts": best_time(lambda: reaction.omit(1, reaction.parts)),
+        "chemistry.Reaction.options": best_time(lambda: reaction.options(1)),
+        "chemistry.Reaction.html_reaction": best_time(reaction.html_reaction),
+    }
+
+
+def bench_codec() -> dict[str, float]:
+    """Time the shared json codec on a reaction payload, on an event sent by a client and on an invalid one."""
+    payload = get_reaction().json(0)
+    message = encode_json(payload)
+    event = encode_json({"type": "select_option_pub", "player": "player", "room": "room", "index": 1, "option": "H",
+                         "turn": 2})
+    invalid = encode_json({"type": "select_option_pub", "player": "player", "room": "room", "index": "1"})
+
+    def reject():
+        try:
+            decode_event(invalid)
+        except ValueError:
+            pass
+
+    return {
+        "codec.encode_json": best_time(lambda: encode_json(payload)),
+        "codec.decode_json": best_time(lambda: decode_json(message)),
+        "codec.decode_event": best_time(lambda: decode_event(event)),
+        "codec.reject_event": best_time(reject),
+    }
+
+
+def bench_state(server) -> dict[str, float]:
+    """Time the delta of a turn on the state shared by the players of a room, and the resync of a player."""
+    room = server.Room("bench-state")
+    room.set_reaction(ReactionDeck(0).draw())
+
+    def turn():
+        # every call is a new turn, so every update has a delta
+        room.game_status['turn'] = 1 - room.game_status['turn']
+        return room.shared.update(room.shared_fields())
+
+    turn()
+    return {
+        "state.update": best_time(turn),
+        "state.since": best_time(lambda: room.shared.since(room.shared.seq - 2)),
+    }
+
+
+def bench_store(server) -> dict[str, float]:
+    """Time a room lookup in both stores, and the batched writes of the sqlite store."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, store in (("memory", RoomStore()), ("sqlite", SQLiteRoomStore(pathlib.Path(directory) / "rooms"))):
+            store.open()
+            rooms = [server.Room(f"room-{number}") for number in range(100)]
+            for room in rooms:
+                store.add_room(room)
+            results[f"store.{name}.room"] = best_time(lambda: store.room("room-50"))
+            results[f"store.{name}.save"] = best_time(lambda: store.save(rooms[50]))
+
+            if isinstance(store, SQLiteRoomStore):
+                def write_batch():
+                    for room in rooms:
+                        store.save(room)
+                    store._write(*store._take_batch())
+                # one batch of 100 changed rooms
+                results["store.sqlite.write_batch"] = best_time(write_batch, repeat=3)
+            store.close()
+    return results
+
+
+def bench_ratelimit() -> dict[str, float]:
+    """Time the token bucket of an event, allowed and throttled."""
+    limiter = RateLimiter({"ping": (1e9, 1e9), "join": (1e-9, 1)}, exempt=())
+    limiter.allow("client", "join")
+    return {
+        "ratelimit.allow": best_time(lambda: limiter.allow("client", "ping")),
+        "ratelimit.throttle": best_time(lambda: limiter.allow("client", "join")),
+    }
+
+
+def seat_partners(server, room_key: str) -> None:
+    """Open a public room with every seat but one taken, the next player joining it starts the game."""
+    server.store.add_room(room := server.Room(room_key))
+    for seat in range(ROOM_SIZE - 1):
+        client_id = f"{room_key}-{seat}"
+        server.store.add_client(server.Client(FakeWebSocket(), client_id))
+        room.add_player(client_id)
+    server.open_public_rooms.add(room_key, 1)
+
+
+def hold_seat(server, room_key: str) -> str:
+    """Open a full room whose last player dropped and has their seat held, returns their resume token."""
+    seat_partners(server, room_key)
+    server.open_public_rooms.discard(room_key)
+    player = server.Client(FakeWebSocket(), f"{room_key}-held")
+    server.store.add_client(player)
+    server.store.room(room_key).add_player(player.client_id)
+    player.add_public_room_key(room_key)
+    token = server.sessions.issue(player)
+    server.sessions.hold(player)
+    server.store.remove_client(player.client_id)
+    return token
+
+
+def last_turn(server, room_key: str) -> None:
+    """Put a started room back on the last turn of its first round, the option the last player selects is played."""
+    room = server.store.room(room_key)
+    if room is not None and room.reaction:
+        room.game_status['turn'] = ROOM_SIZE - 1
+        room.game_status['round'] = 0
+
+
+async def run_handler(server, events: list[dict], before: Callable[[], None] = None) -> None:
+    """Run the handler over one connection that sends `events`, see `FakeWebSocket` for `before`."""
+    await server.handler(FakeWebSocket([encode_json(event) for event in events], before))
+
+
+def bench_handler(server) -> dict[str, float]:
+    """Time every branch of the event dispatch of the handler, per event, and the rejection of a throttled event."""
+    results = {}
+    limits = server.connection_limiter
+
+    def per_event(setup: list[dict], event: dict, count: int = HANDLER_EVENTS,
+                  before: Callable[[object, str], None] = None) -> float:
+        room_key = f"bench-{len(results)}"
+        setup = [{**setup_event, "room": room_key} for setup_event in setup]
+        event = {**event, "room": room_key}
+        room_before = (lambda: before(server, room_key)) if before else None
+
+        def run(events):
+            # every run starts with a new room, the previous one is abandoned once its connection is closed
+            timer = timeit.Timer(lambda: asyncio.run(run_handler(server, events, room_before)),
+                                 setup=lambda: seat_partners(server, room_key))
+            return min(timer.repeat(repeat=3, number=1))
+
+        # the cost of the connection and of the setup events is measured separately and left out
+        overhead = run(setup)
+        return (run(setup + [event] * count) - overhead) / count * 1e9
+
+    join = {"type": "join", "player": None, "player_name": "bench"}
+    reaction = {"type": "get_reaction_pub", "player": None}
+    # every event past the first few of a connection is throttled, the dispatch is timed without limits
+    server.connection_limiter = RateLimiter({}, exempt=())
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["handler.ping"] = per_event([join], {"type": "ping", "player": None})
+        results["handler.room_status"] = per_event([join], {"type": "room_status", "player": None})
+        results["handler.get_reaction_pub"] = per_event([join], reaction)
+        results["handler.turn_status_pub"] = per_event([join, reaction], {"type": "turn_status_pub", "player": None})
+        # the player joining is seated last, every option they select is played and ends the round
+        results["handler.select_option_pub"] = per_event(
+            [join, reaction],
+            {"type": "select_option_pub", "player": None, "index": ROOM_SIZE - 1, "option": "H", "turn": ROOM_SIZE},
+            before=last_turn
+        )
+        # joining and creating are measured once per connection, like real players do
+        results["handler.join"] = best_time(lambda: asyncio.run(run_handler(server, [join])), repeat=3)
+        results["handler.create"] = best_time(
+            lambda: asyncio.run(run_handler(server, [{"type": "create", "player": None, "player_name": "bench"}])),
+            repeat=3
+        )
+
+        # resuming is measured once per connection too, without holding the seat it takes back
+        rooms = itertools.count()
+
+        async def resume(events: bool):
+            room_key = f"bench-resume-{next(rooms)}"
+            token = hold_seat(server, room_key)
+            if events:
+                await run_handler(server, [{"type": "resume", "player": None, "token": token, "room": room_key}])
+
+        results["handler.resume"] = (best_time(lambda: asyncio.run(resume(True)), repeat=3)
+                                     - best_time(lambda: asyncio.run(resume(False)), repeat=3))
+
+        server.connection_limiter = limits
+        results["handler.throttled"] = per_event([join], {"type": "ping", "player": None})
+    return results
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], tolerance: float,
+            noise_floor: float = NOISE_FLOOR) -> list[str]:
+    """
+    Benchmarks slower than their baseline by more than `tolerance`, as printable lines.
+
+    :param noise_floor: Slowdowns of less nanoseconds than this are timing noise and never reported.
+    """
+    regressions = []
+    for name, nanoseconds in results.items():
+        if name not in baseline or nanoseconds - baseline[name] < noise_floor:
+            continue
+        if nanoseconds > baseline[name] * (1 + tolerance):
+            regressions.append(f"{name}: {nanoseconds:.0f}ns, baseline {baseline[name]:.0f}ns "
+                               f"(+{nanoseconds / baseline[name] - 1:.0%})")
+    return regressions
+
+
+def main():
+    """Run every benchmark, write the results and compare them to the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", type=pathlib.Path, default=BENCHMARKS_PATH / "results.json",
+                        help="file the results are written to")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE, help="file of the baseline results")
+    parser.add_argument("--tolerance", type=float, default=1.0,
+                        help="slowdown relative to the baseline tolerated before failing, 1.0 is twice as slow")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    server = load_server()
+    print("json backend:", BACKEND)
+    if failures := check_malformed():
+        print("\nmalformed frames not rejected with a ValueError:", *failures, sep="\n  ")
+        sys.exit(1)
+    results = {**bench_chemistry(), **bench_codec(), **bench_state(server), **bench_store(server),
+               **bench_ratelimit(), **bench_handler(server)}
+
+    for name, nanoseconds in results.items():
+        print(f"{name:<40} {nanoseconds:>12.0f} ns")
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        return
+    if not args.baseline.exists():
+        print(f"\nno baseline at {args.baseline}, run with --update-baseline to create it")
+        return
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    if regressions:
+        print("\nperformance regressions:", *regressions, sep="\n  ")
+        sys.exit(1)
+    print("\nno performance regression")
+
+
+if __name__ == '__main__':
+    main()
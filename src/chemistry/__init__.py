@@ -1,6 +1,10 @@
-from chemistry.reactions import Reaction, get_reaction
+from chemistry.reactions import (
+    Reaction, ReactionDeck, get_reaction, reaction_by_key
+)
 
 __all__ = [
     "Reaction",
-    "get_reaction"
+    "ReactionDeck",
+    "get_reaction",
+    "reaction_by_key",
 ]
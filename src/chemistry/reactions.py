@@ -6,93 +6,158 @@ import string
 
 from config import SRC_PATH
 
-already_sent_reactions = []
-
 with open(str(SRC_PATH / "chemistry" / "reactions.json"), "r") as f:
     reactions_cache = json.load(f)
 
 with open(str(SRC_PATH / "chemistry" / "options.json"), "r") as f:
     options_cache = json.load(f)
 
+# every digit wrapped in a subscript tag, for a single pass of `str.translate`
+HTML_SUBSCRIPTS = str.maketrans({digit: f"<sub>{digit}</sub>" for digit in string.digits})
+
 
 class Reaction:
     """
     Reaction class to easily manage the reactions. Manipulates with how the reaction is presented.
 
+    Reactions are compiled once when the catalog is loaded, every way of presenting them is worked out up front and
+    they are never modified afterwards.
+
     :param not_parsed_reaction: It is a list of the reactants and the reaction obtained from reactions.json.
     :param product: It is the product formed by the reactants during the reaction.
+    :param key: Position of the reaction in the catalog.
 
     Attributes:
         :reaction: Contains the full chemical reaction of the reactants side.
-        :reactants: Contains the reactants present in the chemical reaction.
+        :reactants: Contains the reactants present in the chemical reaction, the two sides separated by " ".
+        :parts: Contains the reactants without the separator, indexed by the position a player fills.
+        :html: The reaction with its digits as subscript in html.
+        :omitted: The reaction with the reactant at each position replaced by "XX".
+        :option_sets: The candidate option lists for the reactant at each position.
     """
 
-    def __init__(self, not_parsed_reaction: list[str], product: str):
+    __slots__ = ("key", "reaction", "reactants", "product", "parts", "template", "omit_templates", "omitted", "html",
+                 "option_sets")
+
+    def __init__(self, not_parsed_reaction: list[str] | tuple[str, ...], product: str, key: int = None):
+        self.key = key
         self.reaction = not_parsed_reaction[0]
-        self.reactants = [*not_parsed_reaction[1:]]
+        self.reactants = tuple(not_parsed_reaction[1:])
         self.product = product
 
+        plus_index = self.reactants.index(" ")
+        self.parts = self.reactants[:plus_index] + self.reactants[plus_index + 1:]
+
+        # "{0}{1} + {2}{3}" and, per position, the same template with that position replaced by "XX".
+        fields = [f"{{{position}}}" for position in range(len(self.parts))]
+        fields.insert(plus_index, " + ")
+        self.template = ''.join(fields)
+        self.omit_templates = tuple(self.template.replace(f"{{{position}}}", "XX")
+                                    for position in range(len(self.parts)))
+
+        self.omitted = tuple(template.format(*self.parts) for template in self.omit_templates)
+        self.html = self.reaction.translate(HTML_SUBSCRIPTS)
+        self.option_sets = tuple(tuple(tuple(options) for options in options_cache[elem]) for elem in self.parts)
+
     def html_reaction(self) -> str:
         """Converts the text formatting to contain subscript in html."""
-        html_reaction = self.reaction
-        for digit in string.digits:
-            html_reaction = html_reaction.replace(digit, f"<sub>{digit}</sub>")
-        return html_reaction
-
-    def options(self, position) -> list[list[str]]:
-        """Generate suitable options for the reactants to choose for."""
-        option_list = self.reactants.copy()
-        option_list.remove(" ")
-        elem = option_list[position]
-        option_list = options_cache[elem]
-        return random.choice(option_list)
-
-    def omit(self, position: int):
-        """Element or Compound to omit from the reaction."""
-        omit_list = self.reactants.copy()
-        plus_index = omit_list.index(" ")
-        omit_list.remove(" ")
-        omit_list[position] = "XX"
-        omit_list.insert(plus_index, " + ")
-        return ''.join(omit_list)
-
-    def json(self, omit_number) -> dict[str, str]:
+        return self.html
+
+    def options(self, position, variant: int = None) -> list[str]:
+        """
+        Generate suitable options for the reactants to choose for.
+
+        :param variant: Index of the option list to use, a random one is picked if it is not given.
+        """
+        option_sets = self.option_sets[position]
+        if variant is None:
+            return list(random.choice(option_sets))
+        return list(option_sets[variant % len(option_sets)])
+
+    def omit(self, position: int, parts: list[str] = None) -> str:
+        """
+        Element or Compound to omit from the reaction.
+
+        :param parts: Reactants to show instead of the ones of the reaction, e.g. the ones picked by the players.
+        """
+        if parts is None:
+            return self.omitted[position]
+        return self.omit_templates[position].format(*parts)
+
+    def fill(self, parts: list[str]) -> str:
+        """The reaction with its reactants replaced by `parts`, e.g. the ones picked by the players."""
+        return self.template.format(*parts)
+
+    def json(self, omit_number, variant: int = None) -> dict[str, str]:
         """Returns a postable json format for server."""
         return {
             "type": "reaction",
             "reaction_original": self.reaction,
             "reaction": self.omit(omit_number),
-            "options": self.options(omit_number),
-            "reactants": self.reactants,
+            "options": self.options(omit_number, variant),
+            "reactants": list(self.reactants),
             "products": self.product,
             "index": omit_number,
         }
 
 
-def get_reaction() -> Reaction:
-    """Gets a chemical reaction from the reactions.json file."""
-    reactions = reactions_cache
+def compile_catalog(reactions: dict[str, list[list[str]]]) -> tuple[Reaction, ...]:
+    """Compiles every reaction of reactions.json, keyed by their position in the catalog."""
+    reaction_list = [
+        (reaction_type, reaction)
+        for reaction_type, reaction_list in reactions.items()
+        for reaction in reaction_list
+    ]
+    return tuple(Reaction(reaction, reaction_type, key)
+                 for key, (reaction_type, reaction) in enumerate(reaction_list))
+
+
+reactions_catalog = compile_catalog(reactions_cache)
+
 
-    if already_sent_reactions:
-        for reaction_type, reaction_list in reactions.items():
-            for reaction in reaction_list:
-                if reaction in already_sent_reactions:
-                    reactions[reaction_type].remove(reaction)
+class ReactionDeck:
+    """
+    Shuffled deck of the reactions of the catalog. Every room draws its reactions from its own deck.
+
+    A reaction is not drawn again before every other reaction of the catalog has been drawn.
+
+    :param seed: Seed of the shuffle, decks with the same seed draw the reactions in the same order.
+    """
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self._cards: list[Reaction] = []
+
+    def __len__(self):
+        return len(self._cards)
 
-    selected_react_type = random.choice(tuple(reactions.keys()))
-    selected_react = random.choice(reactions[selected_react_type])
-    already_sent_reactions.append(selected_react)
-    return Reaction(selected_react, selected_react_type)
+    def draw(self) -> Reaction:
+        """Draws the next reaction, the deck is shuffled again once every reaction has been drawn."""
+        if not self._cards:
+            self._cards = list(reactions_catalog)
+            self.random.shuffle(self._cards)
+        return self._cards.pop()
+
+
+def reaction_by_key(key: int) -> Reaction:
+    """Gets the reaction of the catalog with that key."""
+    return reactions_catalog[key]
+
+
+def get_reaction() -> Reaction:
+    """Gets a random chemical reaction from the reactions.json file."""
+    return random.choice(reactions_catalog)
 
 
 if __name__ == '__main__':
     # subscript: ₁₂₃₄₅₆₇₈₉
     # with open(str(SRC_PATH / "chemistry" / "reactions.json"), "w") as f:
     #      json.dump(writeable, f, indent=2)
-    r = get_reaction()
+    deck = ReactionDeck(seed=0)
+    r = deck.draw()
     print(r.reaction, r.reactants, r.html_reaction(), r.json(0))
     print(r.reaction, r.reactants, r.html_reaction(), r.json(1))
     print(r.reaction, r.reactants, r.html_reaction(), r.json(2))
     print(r.reaction, r.reactants, r.html_reaction(), r.json(3))
-    r1 = get_reaction()
+    r1 = deck.draw()
     print(r1.reaction, r1.reactants, r1.html_reaction(), r1.json(0))
@@ -9,11 +9,93 @@ SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 SCREEN_TITLE = "CHEMYSTERY"
 
+# background music, its volume and the second it starts at
+MUSIC_VOLUME = 0.1
+MUSIC_START = 90
+
 # websockets
 
+# json codec: "auto" (fastest installed), "msgspec", "orjson" or "json"
+JSON_BACKEND = "auto"
+
+SERVER_PORT = 8001
+SERVER_URI = f"ws://localhost:{SERVER_PORT}"
+# worker processes of the server, the worker i also listens on its own port WORKER_PORT + i
+SERVER_WORKERS = 1
+WORKER_PORT = 8101
+# http endpoint of the metrics of the server, scraped at /metrics, METRICS_PORT + i for the worker i
+METRICS_PORT = 9001
+
 WAITING_SECOND = 3
 ROOM_SIZE = 2
 MAX_ROUNDS = 3
 
+# deltas of the state of a room kept for the players resyncing, older players get a whole snapshot
+STATE_HISTORY = 32
+# permessage-deflate of the connections, None disables it. The deltas repeat the same keys, so a small window kept
+# between the messages compresses them well for little memory per connection
+DEFLATE_WINDOW_BITS = 10
+DEFLATE_MEM_LEVEL = 4
+
+# messages queued to a client before its outbox is full, and what happens then: "coalesce", "drop_oldest" or
+# "disconnect"
+OUTBOX_SIZE = 64
+OUTBOX_POLICY = "drop_oldest"
+
+# where the rooms are kept: "memory", or "sqlite" to also write them to ROOM_STORE_PATH and recover them on restart
+ROOM_STORE = "memory"
+ROOM_STORE_PATH = PATH / "rooms.sqlite3"
+# seconds between two batches of writes of the sqlite store
+STORE_FLUSH_INTERVAL = 0.1
+
+# rate limits, (events per second, burst) by event type, the event types not listed are not limited
+
+RATE_LIMITS = {
+    "ping": (1, 5),
+    "join": (1, 3),
+    "create": (0.2, 2),
+    "room_status": (5, 10),
+    "get_reaction_pub": (5, 10),
+    "turn_status_pub": (5, 10),
+    "select_option_pub": (5, 10),
+    "resume": (1, 3),
+}
+# shared by every connection from the same address
+ADDRESS_RATE_LIMITS = {
+    "join": (10, 50),
+    "create": (2, 20),
+    "resume": (5, 20),
+}
+# addresses without a limit of their own, the bots of a local load test all share one
+RATE_LIMIT_EXEMPT = ("127.0.0.1", "::1")
+
+# room lifecycle, in seconds
+
+ROOM_IDLE_TTL = 600
+ROOM_CLOSED_TTL = 30
+REAPER_INTERVAL = 15
+# seconds a room nobody is in is kept, e.g. one recovered after a restart, for its players to join it again
+ROOM_EMPTY_TTL = 60
+# seconds the seat of a player whose connection dropped is held for them to resume, 0 frees it at once
+RESUME_GRACE = 30
+
+# performance overlay of the client, toggled with F3 in a game, F4 appends its numbers to PERF_CSV_PATH
+
+# samples kept per measure
+PERF_HISTORY = 300
+# seconds between two refreshes of the overlay text
+PERF_REFRESH = 0.5
+PERF_CSV_PATH = PATH / "perf.csv"
+
+# logging of the server
+
+LOG_LEVEL = "INFO"
+# share of the records kept per event type, 0 drops them all, the types not listed are always kept
+LOG_SAMPLE_RATES = {
+    "ping": 0,
+    "room_status": 0.01,
+    "turn_status_pub": 0.01,
+}
+
 if __name__ == '__main__':
     print(ASSET_PATH)
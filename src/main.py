@@ -1,11 +1,18 @@
+import argparse
+
 import arcade
 
 from config import SCREEN_HEIGHT, SCREEN_TITLE, SCREEN_WIDTH
 from window import Menu, Window
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Chemystery game client.")
+    parser.add_argument("--exit-after-first-frame", action="store_true",
+                        help="close once the first frame is drawn, see benchmarks/bench_startup.py")
+    args = parser.parse_args()
+
     # arcade.schedule(lambda _: print(proc.stdout.read()), interval=3)
-    game = Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    game = Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, exit_after_first_frame=args.exit_after_first_frame)
     menu = Menu(game)
     game.show_view(menu)
     arcade.run()
@@ -0,0 +1,25 @@
+from protocol.codec import BACKEND, decode_json, encode_json
+from protocol.events import (
+    EVENT_TYPES, EVENTS, Create, Event, GetReaction, Join, Ping, Resume,
+    RoomStatus, SelectOption, TurnStatus, decode_event
+)
+from protocol.state import StateMirror
+
+__all__ = [
+    "BACKEND",
+    "Create",
+    "decode_event",
+    "decode_json",
+    "encode_json",
+    "Event",
+    "EVENT_TYPES",
+    "EVENTS",
+    "GetReaction",
+    "Join",
+    "Ping",
+    "Resume",
+    "RoomStatus",
+    "SelectOption",
+    "StateMirror",
+    "TurnStatus",
+]
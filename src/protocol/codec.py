@@ -0,0 +1,70 @@
+"""
+Contains the json codec shared by the server and the client.
+
+The fastest installed backend is used unless `JSON_BACKEND` in config.py says otherwise. Whatever the backend, the
+messages are `str` so they are sent as text frames, and invalid json raises a `ValueError`.
+"""
+
+import json
+
+from config import JSON_BACKEND
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = {
+    "msgspec": msgspec,
+    "orjson": orjson,
+    "json": json,
+}
+
+
+def pick_backend(name: str = JSON_BACKEND) -> str:
+    """Name of the backend to use, "auto" picks the fastest installed one."""
+    if name == "auto":
+        return next(backend for backend, module in BACKENDS.items() if module is not None)
+    if BACKENDS.get(name) is None:
+        raise ImportError(f"json backend {name!r} is not installed")
+    return name
+
+
+BACKEND = pick_backend()
+
+if BACKEND == "msgspec":
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    def encode_json(message) -> str:
+        """Helper function ( dict -> str of json )"""
+        return _encoder.encode(message).decode()
+
+    def decode_json(message) -> dict:
+        """Helper function ( str of json -> dict )"""
+        return _decoder.decode(message)
+
+elif BACKEND == "orjson":
+
+    def encode_json(message) -> str:
+        """Helper function ( dict -> str of json )"""
+        return orjson.dumps(message).decode()
+
+    def decode_json(message) -> dict:
+        """Helper function ( str of json -> dict )"""
+        return orjson.loads(message)
+
+else:
+
+    def encode_json(message) -> str:
+        """Helper function ( dict -> str of json )"""
+        return json.dumps(message, ensure_ascii=False)
+
+    def decode_json(message) -> dict:
+        """Helper function ( str of json -> dict )"""
+        return json.loads(message)
@@ -0,0 +1,151 @@
+"""
+Contains the typed events the clients send to the server.
+
+Every message is validated against the schema of its event class when it is decoded, compiled once when the classes
+are defined, so the handlers can use the fields of an event without checking them again.
+"""
+
+import typing
+from typing import Union
+
+from protocol.codec import BACKEND, decode_json, msgspec
+
+if BACKEND == "msgspec":
+    class Event(msgspec.Struct, tag_field="type", kw_only=True):
+        """An event sent by a client, its class is picked by the "type" of the message."""
+
+        player: str | None = None
+
+else:
+    # marks the fields without a default, that every event of the class must have
+    REQUIRED = object()
+
+    class Event:
+        """An event sent by a client, its class is picked by the "type" of the message."""
+
+        player: str | None = None
+
+        def __init_subclass__(cls, tag: str = None, **kwargs):
+            super().__init_subclass__(**kwargs)
+            cls.tag = tag
+            # every annotated field of the class and its bases, with its default or None
+            cls.fields = {
+                name: getattr(cls, name, None)
+                for base in reversed(cls.__mro__)
+                for name in base.__dict__.get("__annotations__", {})
+            }
+            # the validator of the class, compiled once: the accepted types and the default of every field
+            cls.schema = tuple(
+                (name, _accepted_types(annotation), getattr(cls, name, REQUIRED))
+                for name, annotation in typing.get_type_hints(cls).items()
+            )
+
+        def __init__(self, fields: dict):
+            """
+            Build the event from the fields of a message, raises a ValueError if they don't match the schema.
+
+            The fields are taken as one dictionary, the keys of a message are never arguments, e.g. "self".
+            """
+            for name, types, default in self.schema:
+                value = fields.get(name, default)
+                if value is REQUIRED:
+                    raise ValueError(f"Object missing required field `{name}`")
+                # bool is a subclass of int, but never a valid int field
+                if not isinstance(value, types) or (value is True or value is False) and bool not in types:
+                    raise ValueError(f"Expected `{' | '.join(t.__name__ for t in types)}`, got "
+                                     f"`{type(value).__name__}` - at `$.{name}`")
+                setattr(self, name, value)
+
+        def __repr__(self):
+            fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+            return f"{type(self).__name__}({fields})"
+
+    def _accepted_types(annotation) -> tuple[type, ...]:
+        """Types `isinstance` accepts for an annotation, e.g. `(str, NoneType)` for `str | None`."""
+        return typing.get_args(annotation) or (annotation,)
+
+
+class Ping(Event, tag="ping"):
+    """Keeps the connection alive."""
+
+
+class Join(Event, tag="join"):
+    """Join the private room `room_key`, or any public room if it is not given."""
+
+    player_name: str | None = None
+    room_key: str | None = None
+
+
+class Create(Event, tag="create"):
+    """Create a private room."""
+
+    player_name: str | None = None
+
+
+class Resume(Event, tag="resume"):
+    """
+    Take back the seat held for a player whose connection dropped, with the last resume token the server sent.
+
+    The key of the room sends the player to the worker holding it, the only one that knows the token.
+    """
+
+    token: str
+    room: str
+
+
+class RoomStatus(Event, tag="room_status"):
+    """Ask for the players of a room."""
+
+    room: str
+
+
+class GetReaction(Event, tag="get_reaction_pub"):
+    """Ask for a snapshot of the state of the room, the reaction of the first round is drawn if none is played yet."""
+
+    room: str
+
+
+class TurnStatus(Event, tag="turn_status_pub"):
+    """Ask for the changes of the state of the room since `seq`, or for a snapshot of it if `seq` is not given."""
+
+    room: str
+    seq: int | None = None
+
+
+class SelectOption(Event, tag="select_option_pub"):
+    """Fill the reactant at `index` with `option`, `turn` being the turn that follows."""
+
+    room: str
+    index: int
+    option: str
+    turn: int
+
+
+EVENTS = (Ping, Join, Create, Resume, RoomStatus, GetReaction, TurnStatus, SelectOption)
+# "type" of the messages of each event class
+EVENT_TYPES = {event: event.__struct_config__.tag if BACKEND == "msgspec" else event.tag for event in EVENTS}
+
+if BACKEND == "msgspec":
+    _decoder = msgspec.json.Decoder(Union[EVENTS])
+
+    def decode_event(message) -> Event:
+        """Helper function ( str of json -> typed event ), raises a ValueError for an invalid event."""
+        return _decoder.decode(message)
+
+else:
+    _event_types = {event.tag: event for event in EVENTS}
+
+    def decode_event(message) -> Event:
+        """Helper function ( str of json -> typed event ), raises a ValueError for an invalid event."""
+        data = decode_json(message)
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected `object`, got `{type(data).__name__}`")
+        try:
+            event_type = _event_types[data["type"]]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid value {data.get('type')!r} - at `$.type`") from e
+        try:
+            return event_type(data)
+        except TypeError as e:
+            # whatever the message holds, the handler only ever has to catch a ValueError
+            raise ValueError(str(e)) from e
@@ -0,0 +1,38 @@
+"""Contains the copy of the state of a room a client keeps, from the snapshot and the deltas the server sends."""
+
+
+class StateMirror:
+    """
+    State of a room as last sent by the server, versioned by its sequence number.
+
+    A "state" event replaces the whole state and a "state_delta" event sets the fields that changed since its `base`,
+    the previous sequence number if it is left out. A delta whose base is newer than the state means some deltas were
+    missed, the client then sends a `turn_status_pub` event with its `seq` to resync.
+
+    Attributes:
+        :seq: Sequence number of the state, None until the first snapshot.
+        :fields: The fields of the state.
+    """
+
+    def __init__(self):
+        self.seq: int = None
+        self.fields: dict = {}
+
+    def apply(self, event: dict) -> bool:
+        """Apply a "state" or "state_delta" event, returns False if deltas were missed and a resync is needed."""
+        if event["type"] == "state":
+            if self.seq is None or event["seq"] >= self.seq:
+                self.seq = event["seq"]
+                self.fields = dict(event["state"])
+            return True
+        if self.seq is None or event.get("base", event["seq"] - 1) > self.seq:
+            return False
+        # a delta older than the state is already applied
+        if event["seq"] > self.seq:
+            self.fields.update(event["changes"])
+            self.seq = event["seq"]
+        return True
+
+    def seat(self, player: str) -> int:
+        """Position of a player in the room, which is also the reactant they fill."""
+        return list(self.fields["players"]).index(player)
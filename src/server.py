@@ -1,35 +1,60 @@
 #!/usr/bin/env python
 
+import argparse
 import asyncio
-import json
+import collections
+import contextlib
+import functools
+import logging
+import multiprocessing
 import secrets
+import signal
+import sys
+import time
+from typing import Callable
 
 import websockets
+import websockets.extensions.permessage_deflate
 import websockets.legacy.server
 
-from chemistry import Reaction, get_reaction
-from config import ROOM_SIZE
+from chemistry import Reaction, ReactionDeck, reaction_by_key
+from config import (
+    ADDRESS_RATE_LIMITS, DEFLATE_MEM_LEVEL, DEFLATE_WINDOW_BITS, MAX_ROUNDS,
+    METRICS_PORT, RATE_LIMITS, ROOM_SIZE, SERVER_PORT, SERVER_WORKERS,
+    WORKER_PORT
+)
+from protocol import (
+    EVENT_TYPES, Create, GetReaction, Join, Ping, Resume, RoomStatus,
+    SelectOption, TurnStatus, decode_event, encode_json
+)
+from server import (
+    REPLY, MatchmakingIndex, Metrics, Outbox, RateLimiter, RoomReaper,
+    RoomState, Sessions, ShardMap, VersionedState, get_logger, open_store,
+    setup_logging
+)
+
+log = get_logger("chemystery.server")
 
 # Global varibales
-online_clients: dict[str, "Client"] = {}
-private_rooms: dict[str, "Room"] = {}
-public_rooms: dict[str, "Room"] = {}
-public_rooms_keys: list[str] = []
-planned_disconnection: list[str] = []
-
-
-def encode_json(message) -> str:
-    """Helper function ( dict -> str of json )"""
-    return json.dumps(message, ensure_ascii=False)
-
-
-def decode_json(message) -> dict:
-    """Helper function ( str of json -> dict )"""
-    return json.loads(message)
+# the online clients and the rooms
+store = open_store()
+open_public_rooms = MatchmakingIndex()
+# the rooms this process holds, when the server runs several worker processes
+shards = ShardMap()
+
+# messages coalesced or dropped by the outboxes of the clients, and clients disconnected for being too slow
+outbox_counters = collections.Counter(coalesced=0, dropped=0, disconnected=0)
+# token buckets of the events of every connection, and of every remote address
+connection_limiter = RateLimiter(RATE_LIMITS, exempt=())
+address_limiter = RateLimiter(ADDRESS_RATE_LIMITS)
+# the reply to a throttled event, encoded once
+THROTTLED = encode_json({"type": "error", "message": "Too many requests."})
+# close codes of a connection closed on purpose, normal closure and going away
+CLEAN_CLOSE_CODES = (1000, 1001)
 
 
 class Client:
-    """Client class that store in 'online_clients' dict & 'Room' object"""
+    """Client class that store in the 'store' & 'Room' object"""
 
     def __init__(self, websocket: websockets.legacy.server.WebSocketServerProtocol,
                  client_id, room_key="") -> None:
@@ -38,6 +63,15 @@ class Client:
         self.room_key: str = room_key
         self.private: bool = False
         self.name: str = None
+        self.address: str = (websocket.remote_address or ("",))[0]
+        # messages to the player are queued here and sent by its own writer task
+        self.outbox = Outbox(websocket, outbox_counters)
+        # the token the player takes their seat back with if their connection drops, see `Sessions`
+        self.resume_token: str = None
+
+    def send(self, message: str | bytes, kind: str | None = REPLY, latest: Callable[[], str | bytes] = None) -> None:
+        """Queue a message to the player, without waiting, a reply unless a kind is given, see `Outbox.put`."""
+        self.outbox.put(message, kind, latest)
 
     def add_public_room_key(self, room_key: str) -> None:
         """Update room key for public room."""
@@ -52,388 +86,672 @@ class Client:
 class Room:
     """A room contains a maximum of 4 players. If 4 players are present in the room the game starts."""
 
-    def __init__(self, room_key) -> None:
+    def __init__(self, room_key, seed=None) -> None:
         self.room_key: str = room_key
         self.clients: dict[str, Client] = {}
-        self.socket_list: list = []  # list of websocket object ( for brocasting )
-        self.game_status: dict = {"winner": None, "started": False, "confirmed participants": [], "turn": 0}
+        self.game_status: dict = {"winner": None, "started": False, "confirmed participants": [], "turn": 0,
+                                  "round": 0, "won": 0}
         self.private: bool = False
+        self.state: RoomState = RoomState.WAITING
+        self.last_activity: float = time.monotonic()
 
         self.reaction: Reaction = None
+        # reactants of the reaction as filled in by the players so far
+        self.parts: list[str] = []
+        # which options are offered for the reaction, fixed for the whole round
+        self.variant: int = 0
+        # what the players see of the room, sent as a snapshot and then as deltas
+        self.shared = VersionedState(encode_json)
+        # the room key seeds the deck unless told otherwise, so the reactions of a game can be reproduced
+        self.deck = ReactionDeck(room_key if seed is None else seed)
 
     def __len__(self):
         return len(self.clients)
 
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> "Room":
+        """Room saved by the store before a restart, none of its players are connected anymore."""
+        room = cls(snapshot["room_key"])
+        room.private = snapshot["private"]
+        room.state = RoomState(snapshot["state"])
+        # the fields added since the snapshot was written keep their default
+        room.game_status = {**room.game_status, **snapshot["game_status"]}
+        if snapshot["reaction"] is not None:
+            room.reaction = reaction_by_key(snapshot["reaction"])
+        room.parts = snapshot["parts"]
+        room.variant = snapshot["variant"]
+        return room
+
+    def snapshot(self) -> dict:
+        """The state of the room that can outlive the server, as written by the store."""
+        return {
+            "room_key": self.room_key,
+            "private": self.private,
+            "state": self.state.value,
+            "game_status": self.game_status,
+            "players": self.client_data(),
+            "reaction": self.reaction.key if self.reaction else None,
+            "parts": self.parts,
+            "variant": self.variant,
+        }
+
+    def shared_fields(self) -> dict:
+        """The current value of every field of the state shared by the players, see `VersionedState`."""
+        reaction = self.reaction
+        # the players look the reaction and its options up in their own copy of the catalog, so only the reactants
+        # picked that differ from the ones of the reaction are sent, by position
+        parts = {str(position): part for position, part in enumerate(self.parts) if part != reaction.parts[position]}
+        return {
+            "state": self.state.value,
+            "players": self.client_data(),
+            "round": self.game_status['round'],
+            "turn": self.game_status['turn'],
+            "won": self.game_status['won'],
+            "reaction": reaction.key if reaction else None,
+            "variant": self.variant,
+            "parts": parts,
+        }
+
+    def touch(self) -> None:
+        """Record activity in the room, idle rooms are evicted by the reaper."""
+        self.last_activity = time.monotonic()
+        store.save(self)
+
     def add_player(self, client_id: str) -> None:
         """Adds the player in the room."""
-        self.clients[client_id] = online_clients[client_id]
-        self.socket_list.append(online_clients[client_id].socket)
+        self.clients[client_id] = store.clients[client_id]
+        self.touch()
+
+    def client_data(self) -> dict[str, str]:
+        """Map the id of every player in the room to their name."""
+        return {client_id: client.name for client_id, client in self.clients.items()}
+
+    def seat(self, client_id: str) -> int:
+        """Position of a player in the room, which is also the turn they play and the reactant they fill."""
+        return list(self.clients).index(client_id)
 
     def remove_player(self, client_id: str) -> None:
         """Removes player from the room."""
-        self.socket_list.remove(self.clients[client_id].socket)
         del self.clients[client_id]
+        self.touch()
 
+    def set_reaction(self, reaction: Reaction | None) -> None:
+        """Start playing a new reaction, or none once the game is over."""
+        self.reaction = reaction
+        self.parts = list(reaction.parts) if reaction else []
+        if reaction:
+            self.variant = self.deck.random.getrandbits(16)
 
-async def error(websocket: websockets.legacy.server.WebSocketServerProtocol, message):
+    def release(self) -> None:
+        """Drop the references the room holds, once it has been evicted."""
+        self.clients.clear()
+        self.set_reaction(None)
+        self.deck = None
+
+
+def error(client: Client, message):
     """Send an error message."""
     event = {
         "type": "error",
         "message": message,
     }
-    await websocket.send(encode_json(event))
+    client.send(encode_json(event))
 
 
-async def waiting(websocket: websockets.legacy.server.WebSocketServerProtocol):
-    """Handle player waiting untill room size == 4"""
-    print("enter waiting loop")
-    message = await websocket.recv()
-    event = decode_json(message)
-
-    print("wait: ", event)
-    if event["type"] == "start":
-        print(" break waiting loop ! ")
+def redirect(client: Client, uri: str):
+    """Send the player to another worker, they connect to it and send their event again."""
+    event = {
+        "type": "redirect",
+        "uri": uri,
+    }
+    client.send(encode_json(event))
 
 
-async def play_private(websocket: websockets.legacy.server.WebSocketServerProtocol,
-                       client_id: str, current_room: Room):
-    """Receive and process moves from a player.( Private Game )"""
-    print("Private Game start !")
-    try:
-        async for message in websocket:
-            event = decode_json(message)
-            print(event)
-
-            # Game logic
-            print(" current room size:", len(current_room))
-            await websocket.send(encode_json({"type": "debug", "room_size": len(current_room), }))
-
-            if event["type"] == "player_disconnect" and len(current_room) == 1:
-                await error(websocket, encode_json("All the other player left the game !"))
-                break
-            if current_room.game_status["winner"]:
-                print("The winner is ", current_room.game_status["winner"])
-                break
-    finally:
-        # remove player from room
-        del current_room.clients[client_id]
-        pass
+def create_private_room(client: Client):
+    """Handle a connection from the room owner ( the player that create private room )"""
+    client_id = client.client_id
+    room_key = shards.new_room_key()
+    room = Room(room_key)
+    room.private = True
+    store.add_room(room)
+    room.add_player(client_id)
+    log.info("private room created", room=room_key, client=client_id)
+
+    client.add_private_room_key(room_key)
+
+    # Send the secret access tokens to the browser of the first player,
+    # where they'll be used for building "room_key" and "watch" links.
+    event = {
+        "type": "init",
+        "player": client_id,
+        "room_key": room_key,
+    }
+    client.send(encode_json(event))
 
 
-async def play_public(websocket: websockets.legacy.server.WebSocketServerProtocol, client_id: str, current_room: Room):
-    """Receive and process moves from a player.( Public Game )"""
-    print("Public Game start !")
+def join_private_game(client: Client, room_key: str):
+    """Handle a connection from the other player ( except the one who create room )"""
+    if not shards.owns(room_key):
+        redirect(client, shards.owner_uri(room_key))
+        return
 
     try:
-        async for message in websocket:
-            event = decode_json(message)
-            print(event)
+        current_room = store.private_rooms[room_key]
+    except KeyError:
+        error(client, "Game not found.")
+        return
+    if current_room.state is not RoomState.WAITING or len(current_room) >= ROOM_SIZE:
+        # like a public room, a private one only takes players until its game starts
+        error(client, "Game already started.")
+        return
+
+    # add current player to current room
+    current_room.add_player(client.client_id)
+    client.add_private_room_key(room_key)
 
-            # Game logic
+    # broadcast new player join message
+    event = {
+        "type": "player_join",
+        "player": client.client_id,
+        "room": room_key,
+    }
+    broadcast(current_room, encode_json(event))
 
-            if event["type"] == "player_disconnect":
-                print("The public game end becase player disconnect")
+    if len(current_room) == ROOM_SIZE:
+        # current player is the fourth player that join the game.
+        # brocadcast start event to all players in the room
+        event = {
+            "type": "start",
+        }
+        broadcast(current_room, encode_json(event))
+        push_room_filled(current_room)
 
-                await error(websocket, "The public game end becase player disconnect")
-                return
-            if current_room.game_status["winner"]:
-                print("The winner is ", current_room.game_status["winner"])
-                return
-    finally:
-        # remove player from room
-        del current_room.clients[client_id]
-        pass
 
+def create_public_room(client: Client):
+    """Create public room
 
-async def create_private_room(websocket: websockets.legacy.server.WebSocketServerProtocol, client_id: str):
-    """Handle a connection from the room owner ( the player that create private room )"""
-    room_key = secrets.token_urlsafe(6)
-    private_rooms[room_key] = Room(room_key)
-    private_rooms[room_key].add_player(client_id)
+    The function will be called when there is no public room with a free seat.
+    """
+    client_id = client.client_id
+    # create new room
+    room_key = shards.new_room_key()
+    log.info("public room created", room=room_key, client=client_id)
+    room = Room(room_key)
+    store.add_room(room)
+    room.add_player(client_id)
+    open_public_rooms.add(room_key, ROOM_SIZE - 1)
+    shards.publish_open_rooms(len(open_public_rooms))
 
-    online_clients[client_id].add_private_room_key(room_key)
+    client.add_public_room_key(room_key)
 
-    try:
-        # Send the secret access tokens to the browser of the first player,
-        # where they'll be used for building "room_key" and "watch" links.
-        event = {
-            "type": "init",
-            "player": client_id,
-            "room_key": room_key,
-        }
-        await websocket.send(encode_json(event))
+    event = {
+        "type": "init",
+        "player": client_id,
+        "room": room_key,
+    }
+    client.send(encode_json(event))
 
-        await waiting(websocket)
-        await play_private(websocket, client_id, private_rooms[room_key])
+    if len(room) == ROOM_SIZE:
+        push_room_filled(room)
 
-    finally:
-        pass
 
+def join_public_game(client: Client):
+    """Handle a connection that player joined public game."""
+    # claiming the seat and adding the player happen without awaiting in between, so no other join can take it
+    room_key = open_public_rooms.claim()
+    if room_key is None:
+        worker = shards.worker_with_open_room()
+        # a player that was already redirected connected to the port of its worker, they are never sent further
+        if worker is not None and client.socket.local_address[1] == SERVER_PORT:
+            redirect(client, shards.uri(worker))
+            return
 
-async def join_private_game(websocket: websockets.legacy.server.WebSocketServerProtocol,
-                            client_id: str, room_key: str):
-    """Handle a connection from the other player ( except the one who create room )"""
-    try:
-        current_room = private_rooms[room_key]
-    except KeyError:
-        await error(websocket, "Game not found.")
+        # the situation that player become room creater
+        create_public_room(client)
         return
+    shards.publish_open_rooms(len(open_public_rooms))
 
+    current_room = store.public_rooms[room_key]
     # add current player to current room
-    current_room.add_player(client_id)
-    online_clients[client_id].add_private_room_key(room_key)
+    current_room.add_player(client.client_id)
+    client.add_public_room_key(room_key)
 
     # broadcast new player join message
     event = {
         "type": "player_join",
-        "player": client_id,
-        "room": room_key,
+        "player": client.client_id,
+        "room": room_key
     }
-    websockets.broadcast(current_room.socket_list, encode_json(event))
+    broadcast(current_room, encode_json(event))
 
-    try:
-        if len(current_room) == ROOM_SIZE:
-            # current player is the fourth player that join the game.
-            event = {
-                "type": "start",
-            }
-            websockets.broadcast(current_room.socket_list, encode_json(event))
-            # brocadcast start event to all players in the room
-            # ( break waiting loop for other players )
-
-            await play_private(websocket, client_id, current_room)
-        else:
-            await waiting(websocket)
-            await play_private(websocket, client_id, current_room)
-    finally:
-        # print("join private play finally : " , client_id )
-        # del current_room.clients[ client_id ]
-        pass
+    if len(current_room) == ROOM_SIZE:
+        # current player is the fourth player that join the game.
+        push_room_filled(current_room)
 
 
-async def create_public_room(websocket: websockets.legacy.server.WebSocketServerProtocol, client_id):
-    """Create public room
+def push_room_filled(room: Room) -> None:
+    """Start the game of a full room and tell every player in it."""
+    room.game_status['started'] = True
+    room.state = RoomState.PLAYING
+    # the first state of the room, the players ask for its snapshot
+    room.set_reaction(room.deck.draw())
+    push_state(room)
+    store.save(room)
+    broadcast(room, room_started(room), kind="reply_room_status")
 
-    The function will be called when :
 
-        1. when 'ROOMS' is empty
-        2. when the last room from 'ROOMS' is full
-    """
-    print("create public game\n")
+def room_started(room: Room) -> str:
+    """Encoded message telling the players of a room that its game started."""
+    event = {
+        "type": "reply_room_status",
+        "length": len(room),
+        "client_data": room.client_data(),
+        "started": True
+    }
+    return encode_json(event)
+
+
+def broadcast(room: Room, message: str | bytes, kind: str = None, latest: Callable[[], str | bytes] = None) -> None:
+    """Push the same message to every player of the room, without waiting for any of them, see `Outbox.put`."""
+    metrics.fanout.observe(len(room))
+    for client in room.clients.values():
+        client.send(message, kind, latest)
+
+
+def push_state(room: Room) -> None:
+    """Send the fields of the room that changed to every player, as one delta encoded once for all of them."""
+    delta = room.shared.update(room.shared_fields())
+    if delta is not None:
+        # a player whose outbox is full gets one snapshot instead of the deltas they could not take yet
+        broadcast(room, delta, kind="state", latest=room.shared.snapshot)
+
+
+def evict_room(room: Room) -> None:
+    """Remove a room from the server and release everything it holds."""
+    open_public_rooms.discard(room.room_key)
+    shards.publish_open_rooms(len(open_public_rooms))
+    store.remove_room(room)
+    # the players still seated go back to the menu, the event is sent like a reply so it is never dropped
+    event = encode_json({"type": "room_closed", "room": room.room_key, "reason": room.state.value})
+    for client in room.clients.values():
+        client.room_key = ""
+        sessions.revoke(client)
+        client.send(event)
+    room.release()
+
+
+reaper = RoomReaper((store.public_rooms, store.private_rooms), evict_room)
+
+metrics = Metrics()
+metrics.gauge("chemystery_online_clients", "Players connected.", lambda: len(store.clients))
+metrics.gauge("chemystery_public_rooms", "Public rooms, whatever their state.", lambda: len(store.public_rooms))
+metrics.gauge("chemystery_private_rooms", "Private rooms, whatever their state.", lambda: len(store.private_rooms))
+metrics.gauge("chemystery_open_public_rooms", "Public rooms with a free seat.", lambda: len(open_public_rooms))
+metrics.collect("chemystery_rooms", "Rooms by state, live or reaped so far", reaper.stats,
+                counters=(*(f"reaped_{state.value}" for state in RoomState), "reaped"))
+metrics.collect("chemystery_store", "Writes of the room store", store.stats, counters=("batches",))
+metrics.gauge("chemystery_outbox_messages", "Messages queued to the players.",
+              lambda: sum(len(client.outbox) for client in store.clients.values()))
+metrics.gauge("chemystery_outbox_max_depth", "Messages queued to the player with the most of them.",
+              lambda: max((len(client.outbox) for client in store.clients.values()), default=0))
+metrics.collect("chemystery_outbox", "Messages the outboxes coalesced or dropped, and players too slow to keep up",
+                lambda: outbox_counters, counters=outbox_counters)
+metrics.collect("chemystery_connection_rate_limit", "Token buckets of the connections, and events they throttled",
+                connection_limiter.stats, counters=("throttled",))
+metrics.collect("chemystery_address_rate_limit", "Token buckets of the remote addresses, and events they throttled",
+                address_limiter.stats, counters=("throttled",))
+
+
+def leave_room(client: Client) -> None:
+    """Remove a disconnected player from their room and tell the players that are left."""
+    room = store.room(client.room_key)
+    if room is None or client.client_id not in room.clients:
+        return
 
-    # create new room
-    room_key = secrets.token_urlsafe(6)
-    public_rooms_keys.append(room_key)
-    public_rooms[public_rooms_keys[-1]] = Room(room_key)
-    public_rooms[room_key].add_player(client_id)
+    room.remove_player(client.client_id)
+    if room.state == RoomState.PLAYING or (room.state == RoomState.WAITING and not len(room)):
+        # the game can't go on without the player, or nobody is left, a finished game stays finished
+        room.state = RoomState.ABANDONED
+        open_public_rooms.discard(room.room_key)
+    elif not client.private and room.state == RoomState.WAITING:
+        # the seat can be taken by the next player looking for a public game
+        open_public_rooms.release(room.room_key)
+    shards.publish_open_rooms(len(open_public_rooms))
+    if room.shared.seq:
+        # the players that have a state of the room see it abandoned
+        push_state(room)
 
-    online_clients[client_id].add_public_room_key(room_key)
+    event = {
+        "type": "player_disconnect",
+        "player": client.client_id,
+    }
+    broadcast(room, encode_json(event))
 
-    try:
-        event = {
-            "type": "init",
-            "player": client_id,
-            "room": room_key,
-        }
-        await websocket.send(encode_json(event))
 
-        await waiting(websocket)
-        await play_public(websocket, client_id, public_rooms[room_key])
-    finally:
-        pass
+def release_seat(client: Client) -> None:
+    """Free the seat held for a player who did not resume in time."""
+    log.info("seat released", client=client.client_id, room=client.room_key)
+    leave_room(client)
 
 
-async def join_public_game(websocket: websockets.legacy.server.WebSocketServerProtocol, client_id):
-    """Handle a connection that player joined public game."""
-    print("join public game\n")
+sessions = Sessions(release_seat)
+metrics.collect("chemystery_sessions", "Valid resume tokens, and seats held for the players to resume",
+                sessions.stats)
 
-    if (len(public_rooms_keys) == 0) or (len(public_rooms[public_rooms_keys[-1]]) == ROOM_SIZE):
-        # the situation that player become room creater
-        await create_public_room(websocket, client_id)
 
-    else:
-        # the last room is <= ROOM_SIZE
-        last_room_key = public_rooms_keys[-1]
-        current_room = public_rooms[last_room_key]
-        # add current player to current room
-        current_room.add_player(client_id)
-        online_clients[client_id].add_public_room_key(last_room_key)
-
-        # broadcast new player join message
+def offer_resume(client: Client) -> None:
+    """Send a resume token to a player that just took a seat, they take it back with it if their connection drops."""
+    if client.room_key and client.resume_token is None:
         event = {
-            "type": "player_join",
-            "player": client_id,
-            "room": last_room_key
+            "type": "session",
+            "player": client.client_id,
+            "room": client.room_key,
+            "resume": sessions.issue(client),
         }
-        websockets.broadcast(current_room.socket_list, encode_json(event))
-
-        try:
-            if len(current_room) == ROOM_SIZE:
-                # current player is the fourth player that join the game.
-
-                client_ids = tuple(current_room.clients.keys())
-                client_names = []
-                for client in client_ids:
-                    client_names.append(online_clients[client].name)
-                client_data = dict(zip(client_ids, client_names))
-                current_room.game_status['started'] = True
-                event = {
-                    "type": "reply_room_status",
-                    "length": len(current_room),
-                    "client_data": client_data,
-                    "started": True
-                }
-                await websocket.send(encode_json(event))
-
-                # websockets.broadcast(current_room.socket_list, encode_json(event))
-
-                # brocadcast start event to all players in the room
-                # ( break waiting loop for other players )
-
-                # await play_public(websocket, client_id, current_room)
-            else:
-                await waiting(websocket)
-                await play_public(websocket, client_id, current_room)
-        finally:
-            # del current_room.clients[ client_id ]
-            pass
+        client.send(encode_json(event))
 
 
-async def handler(websocket: websockets.legacy.server.WebSocketServerProtocol):
-    """Handle a connection and dispatch it according to who is connecting."""
-    client_id = ""
+def hold_seat(client: Client, close_code: int | None) -> bool:
+    """
+    Hold the seat of a player whose connection dropped while their game is not over, see `Sessions.hold`.
 
-    try:
-        print("player online !")
-        # add current player to global online client dictionary
+    :param close_code: Close code of the connection, a player that closed it normally left and their seat is freed.
+    """
+    if close_code in CLEAN_CLOSE_CODES:
+        return False
+    room = store.room(client.room_key)
+    if room is None or room.state not in (RoomState.WAITING, RoomState.PLAYING):
+        return False
+    if not sessions.hold(client):
+        return False
+    log.info("seat held", client=client.client_id, room=room.room_key)
+    return True
+
+
+async def resume_session(client: Client, token: str, room_key: str) -> Client:
+    """
+    Give a player the seat held for them on the connection of `client`, returns the client of the connection from now.
 
-        async for message in websocket:
-            event = decode_json(message)
-            print("message : ", event)
+    The player gets a new resume token, the room status if their game started and a snapshot of the room state, the
+    connection they had is closed in case the server did not see it drop.
+    """
+    if client.room_key:
+        error(client, "Already in a room.")
+        return client
+    if not shards.owns(room_key):
+        redirect(client, shards.owner_uri(room_key))
+        return client
+    player = sessions.claim(token)
+    room = store.room(player.room_key) if player is not None else None
+    if room is None or room.room_key != room_key or player.client_id not in room.clients:
+        if player is not None:
+            sessions.revoke(player)
+        error(client, "Session expired.")
+        return client
+
+    previous_socket, previous_outbox = player.socket, player.outbox
+    # the connection is the player's before anything is awaited, the handler of the previous one then leaves them be
+    store.remove_client(client.client_id)
+    player.socket, player.outbox, player.address = client.socket, client.outbox, client.address
+    store.add_client(player)
+    await previous_outbox.close()
+    await previous_socket.close()
+
+    room.touch()
+    log.info("session resumed", client=player.client_id, room=room.room_key)
+    event = {
+        "type": "resumed",
+        "player": player.client_id,
+        "room": room.room_key,
+        "resume": sessions.issue(player),
+    }
+    player.send(encode_json(event))
+    if room.state != RoomState.WAITING:
+        player.send(room_started(room))
+    if room.shared.seq:
+        player.send(room.shared.snapshot())
+    return player
 
-            if event["player"] is None:
-                client_id = secrets.token_urlsafe(6)
-                online_clients[client_id] = Client(websocket, client_id)
-                online_clients[client_id].name = event["player_name"]
-            else:
-                client_id = event["player"]
 
-            if event["auto_disconnect"]:
-                planned_disconnection.append(client_id)
+def throttled(client: Client, event_type: str) -> bool:
+    """Whether an event is over the budget of the connection or of its remote address."""
+    return not (connection_limiter.allow(client.client_id, event_type)
+                and address_limiter.allow(client.address, event_type))
 
-            match event["type"]:
 
-                case "ping":
-                    pass
+def room_of(client: Client, room_key: str) -> Room | None:
+    """The room of the player if its key is `room_key`, otherwise the player gets an error and None is returned."""
+    room = store.room(room_key)
+    if room is None or client.client_id not in room.clients:
+        error(client, "Room not found.")
+        return None
+    room.touch()
+    return room
+
 
-                case "join":
+async def handler(websocket: websockets.legacy.server.WebSocketServerProtocol):
+    """
+    Handle a connection and dispatch it according to who is connecting.
 
-                    print("player join")
+    A client keeps one connection open for its whole session, so every event of the session is dispatched here and
+    the player is only removed from the server once the connection is closed. Events are validated as they are
+    decoded, an invalid one gets an error back and the connection goes on.
+    """
+    # the connection registers the player in the online clients of the store
+    client = Client(websocket, secrets.token_urlsafe(6))
+    client_id = client.client_id
+    client.outbox.start()
+    store.add_client(client)
+
+    try:
+        log.debug("connection opened", client=client_id, address=websocket.remote_address)
 
-                    if "room_key" in event:
+        async for message in websocket:
+            start = time.perf_counter()
+            try:
+                event = decode_event(message)
+            except ValueError as e:
+                error(client, f"Invalid event: {e}")
+                metrics.observe_event("invalid", time.perf_counter() - start)
+                continue
+
+            event_type = EVENT_TYPES[type(event)]
+            if throttled(client, event_type):
+                client.send(THROTTLED)
+                metrics.observe_event("throttled", time.perf_counter() - start)
+                continue
+
+            if log.is_enabled(logging.DEBUG):
+                log.debug("event received", event_type=event_type, client=client_id, event=event)
+
+            match event:
+
+                case Ping():
+                    pass
+
+                case Join() | Create() if client.room_key:
+                    # one connection takes one seat, a second click would take another in the same room
+                    error(client, "Already in a room.")
+
+                case Join():
+                    client.name = event.player_name
+                    if event.room_key is not None:
                         # player join private room
-                        await join_private_game(websocket, client_id, event["room_key"])
+                        join_private_game(client, event.room_key)
                     else:
                         # player join public room
-                        await join_public_game(websocket, client_id)
+                        join_public_game(client)
+                    offer_resume(client)
 
-                case "create":
+                case Create():
                     # The player create private room
-                    print("player create private room")
-                    await create_private_room(websocket, client_id)
-
-                case "room_status":
-                    room = None
-                    if public_rooms.get(event["room"], None) is not None:
-                        room = public_rooms[event['room']]
-                    elif private_rooms.get(event["room"], None) is not None:
-                        room = private_rooms[event['room']]
-                    else:
-                        event = {
-                            "type": "bad request"
-                        }
+                    client.name = event.player_name
+                    create_private_room(client)
+                    offer_resume(client)
 
-                    if room:
-                        client_ids = tuple(room.clients.keys())
-                        client_names = []
-                        for client in client_ids:
-                            client_names.append(online_clients[client].name)
-                        client_data = dict(zip(client_ids, client_names))
+                case Resume():
+                    client = await resume_session(client, event.token, event.room)
+                    client_id = client.client_id
 
-                        event = {
+                case RoomStatus():
+                    room = store.room(event.room)
+                    if room:
+                        reply = {
                             "type": "reply_room_status",
                             "length": len(room),
-                            "client_data": client_data,
+                            "client_data": room.client_data(),
+                        }
+                    else:
+                        reply = {
+                            "type": "bad request"
                         }
-                    await websocket.send(encode_json(event))
-                case "get_reaction_pub":
-                    room = public_rooms[event['room']]
-                    reaction = room.reaction
-                    if not room.reaction:
-                        reaction = get_reaction()
-                        room.reaction = reaction
-
-                    omit_number = tuple(public_rooms[event['room']].clients.keys()).index(client_id)
-                    await websocket.send(encode_json(reaction.json(omit_number)))
-                case "turn_status_pub":
-                    room = public_rooms[event['room']]
-                    omit_number = tuple(public_rooms[event['room']].clients.keys()).index(client_id)
-                    reactants = room.reaction.reactants.copy()
-                    plus_index = reactants.index(" ")
-                    reactants.remove(" ")
-                    reactants[omit_number] = "XX"
-                    reactants.insert(plus_index, " + ")
-                    event = {
-                        "type": "turn_reply",
-                        "turn": room.game_status['turn'],
-                        "reaction": ''.join(reactants),
-                    }
-                    await websocket.send(encode_json(event))
-                case "select_option_pub":
-                    room = public_rooms[event['room']]
-                    reactants = room.reaction.reactants
-                    plus_index = reactants.index(" ")
-                    reactants.remove(" ")
-                    reactants[event['index']] = event['option']
-                    reactants.insert(plus_index, " ")
-
-                    room.game_status['turn'] = event['turn']
-                    if room.game_status['turn'] == ROOM_SIZE:
-                        room.reaction = None
-                        room.game_status['turn'] = 0
-                    event = {
-                        "type": "option_reply",
-                        'turn': room.game_status['turn'],
-                    }
-                    await websocket.send(encode_json(event))
+                    client.send(encode_json(reply))
+                case GetReaction():
+                    if not (room := room_of(client, event.room)):
+                        pass
+                    elif room.state != RoomState.PLAYING:
+                        error(client, "The game is not being played.")
+                    else:
+                        if not room.reaction:
+                            room.set_reaction(room.deck.draw())
+                            push_state(room)
+                        client.send(room.shared.snapshot())
+                case TurnStatus():
+                    if room := room_of(client, event.room):
+                        # the player resyncs after missing some deltas, or asks for the whole state
+                        client.send(room.shared.since(event.seq))
+                case SelectOption():
+                    if not (room := room_of(client, event.room)):
+                        pass
+                    elif not room.reaction:
+                        error(client, "No reaction is being played.")
+                    elif (room.game_status['turn'] != (seat := room.seat(client_id)) or event.index != seat
+                          or event.turn != seat + 1):
+                        # a player only ever fills their own reactant, on their turn
+                        error(client, "Not your turn.")
+                    else:
+                        room.parts[event.index] = event.option
+
+                        room.game_status['turn'] = event.turn
+                        client.send(encode_json({
+                            "type": "option_reply",
+                            'turn': room.game_status['turn'] % ROOM_SIZE,
+                        }))
+
+                        # every player gets the new turn as soon as it happens, and the next reaction once the round
+                        # is complete, in a delta of its own so the last turn of the round is seen
+                        push_state(room)
+                        if room.game_status['turn'] == ROOM_SIZE:
+                            if room.parts == list(room.reaction.parts):
+                                room.game_status['won'] += 1
+                            room.game_status['turn'] = 0
+                            room.game_status['round'] += 1
+                            if room.game_status['round'] == MAX_ROUNDS:
+                                room.state = RoomState.FINISHED
+                                room.set_reaction(None)
+                            else:
+                                room.set_reaction(room.deck.draw())
+                            push_state(room)
+
+            metrics.observe_event(event_type, time.perf_counter() - start)
     finally:
-        if client_id in planned_disconnection:
-            planned_disconnection.remove(client_id)
-            return
-        print("player life cycle end", client_id)
+        log.debug("connection closed", client=client_id)
 
-        if len(online_clients[client_id].room_key) > 0:
-            # if player have joined the game
-            event = {
-                "type": "player_disconnect",
-                "player": client_id,
-            }
+        # a player that resumed on another connection is that connection's now
+        if client.socket is websocket:
+            # the player is forgotten even if leaving their room fails, their seat is kept for a while if it is held
+            try:
+                if not hold_seat(client, websocket.close_code):
+                    sessions.revoke(client)
+                    leave_room(client)
+            finally:
+                store.remove_client(client_id)
+                await client.outbox.close()
 
-            if online_clients[client_id].private:
-                # player join private room
-                websockets.broadcast(private_rooms[online_clients[client_id].room_key].socket_list, encode_json(event))
-            else:
-                # join public room
-                websockets.broadcast(public_rooms[online_clients[client_id].room_key].socket_list, encode_json(event))
 
-        del online_clients[client_id]
+def recover_rooms() -> None:
+    """
+    Put back the rooms of this worker saved by the store before a restart, until the reaper evicts them.
+
+    None of their players are connected anymore, the public rooms that were waiting are open again with every seat
+    free. A game that was being played can't be resumed, the resume tokens of its players did not survive the restart.
+    """
+    recovered = 0
+    for snapshot in store.recover():
+        if shards.owns(snapshot["room_key"]):
+            store.add_room(room := Room.from_snapshot(snapshot))
+            if not room.private and room.state == RoomState.WAITING:
+                open_public_rooms.add(room.room_key, ROOM_SIZE)
+            recovered += 1
+    if recovered:
+        shards.publish_open_rooms(len(open_public_rooms))
+        log.info("rooms recovered", count=recovered, open=len(open_public_rooms))
+
+
+def deflate_extensions() -> list:
+    """Per-message deflate of the connections, with the window and memory level of the config."""
+    if DEFLATE_WINDOW_BITS is None:
+        return []
+    return [websockets.extensions.permessage_deflate.ServerPerMessageDeflateFactory(
+        server_max_window_bits=DEFLATE_WINDOW_BITS,
+        client_max_window_bits=DEFLATE_WINDOW_BITS,
+        compress_settings={"memLevel": DEFLATE_MEM_LEVEL},
+    )]
 
 
 async def main():
     """To get the server started at the uri "ws://localhost:8001"."""
-    async with websockets.serve(handler, "", 8001):
-        await asyncio.Future()
+    listener = setup_logging()
+    store.open()
+    try:
+        recover_rooms()
+        async with contextlib.AsyncExitStack() as stack:
+            # every worker accepts connections on the shared port, the kernel spreads them between the workers
+            serve = functools.partial(websockets.serve, handler, compression=None, extensions=deflate_extensions())
+            await stack.enter_async_context(serve("", SERVER_PORT, reuse_port=shards.workers > 1))
+            if shards.workers > 1:
+                await stack.enter_async_context(serve("", WORKER_PORT + shards.index))
+            await stack.enter_async_context(await metrics.serve(port=METRICS_PORT + shards.index))
+
+            log.info("server started", port=SERVER_PORT, metrics_port=METRICS_PORT + shards.index,
+                     worker=shards.index, workers=shards.workers)
+            await asyncio.gather(reaper.run(), store.run())
+    finally:
+        store.close()
+        listener.stop()
 
 
-if __name__ == "__main__":
+def run_worker(index: int, workers: int, open_rooms) -> None:
+    """Run the worker `index` of the server, in its own process."""
+    global shards
+    shards = ShardMap(index, workers, open_rooms)
     asyncio.run(main())
+
+
+def run_workers(workers: int) -> None:
+    """Run the server in `workers` processes, each holding the rooms whose key belongs to it."""
+    open_rooms = multiprocessing.Array("i", workers, lock=False)
+    processes = [multiprocessing.Process(target=run_worker, args=(index, workers, open_rooms), name=f"worker-{index}")
+                 for index in range(workers)]
+    # the workers are stopped along with the server, whether it is interrupted or terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+    try:
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chemystery websocket server.")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS,
+                        help="number of worker processes, e.g. one per core")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_workers(args.workers)
+    else:
+        asyncio.run(main())
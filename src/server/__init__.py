@@ -1,11 +1,28 @@
-from server.client import client
-from server.server import Client, Room, decode_json, encode_json, handler
+from server.lifecycle import RoomReaper, RoomState
+from server.log import get_logger, setup_logging
+from server.matchmaking import MatchmakingIndex
+from server.metrics import Metrics
+from server.outbox import REPLY, Outbox
+from server.ratelimit import RateLimiter
+from server.sessions import Sessions
+from server.sharding import ShardMap
+from server.store import RoomStore, SQLiteRoomStore, open_store
+from server.versioning import VersionedState
 
 __all__ = [
-    "Client",
-    "handler",
-    "Room",
-    "encode_json",
-    "decode_json",
-    "client"
+    "get_logger",
+    "MatchmakingIndex",
+    "Metrics",
+    "open_store",
+    "Outbox",
+    "RateLimiter",
+    "REPLY",
+    "RoomReaper",
+    "RoomState",
+    "RoomStore",
+    "Sessions",
+    "setup_logging",
+    "ShardMap",
+    "SQLiteRoomStore",
+    "VersionedState",
 ]
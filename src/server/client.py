@@ -1,68 +1,172 @@
 #!/usr/bin/env python
 
-"""Dummy client."""
+"""Dummy client, a bot that plays whole games against the server without any input."""
 
 import asyncio
+import collections
+import random
+import time
 
 import websockets
 import websockets.exceptions
 
-from server import decode_json, encode_json
+from chemistry import reaction_by_key
+from config import MAX_ROUNDS, ROOM_SIZE, SERVER_URI
+from protocol import StateMirror, decode_json, encode_json
 
 
-async def client(oper: int = None):
-    """Connect to server side"""
-    uri = "ws://localhost:8001"
-    async with websockets.connect(uri) as websocket:
+class LatencyStats:
+    """Latencies in seconds recorded by the bots, by event type."""
 
-        try:
-            if oper is None:
-                oper = int(input("input oper : "))
-            if oper == 1:
-                # create private room
-                event = {
-                    "type": "create",
-                }
+    def __init__(self):
+        self.samples: dict[str, list[float]] = collections.defaultdict(list)
 
-                await websocket.send(encode_json(event))
-            elif oper == 2:
-                # join private room
-                key = str(input("input room key: "))
-                event = {
-                    "type": "join",
-                    "room_key": key,
-                }
-                await websocket.send(encode_json(event))
-            else:
-                event = {
-                    "type": "join",
-                }
-                await websocket.send(encode_json(event))
+    def record(self, event_type: str, seconds: float) -> None:
+        """Record the latency of one event."""
+        self.samples[event_type].append(seconds)
+
+    def percentile(self, event_type: str, percent: float) -> float:
+        """Latency under which `percent` percent of the events of a type were answered."""
+        samples = sorted(self.samples[event_type])
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
 
-            async for message in websocket:
 
-                print("mes: ", message)
-                event = decode_json(message)
+class Bot:
+    """
+    A player that joins or creates a room and plays every round of the game with random options.
 
-                if event["type"] == "waiting":
-                    # await websocket.send( encode_json(event) )
-                    print("still waiting")
-                elif event["type"] == "start":
-                    # The game start
-                    await websocket.send(encode_json(event))
+    :param name: Name of the player.
+    :param stats: Where the latency of the handshake and of every request is recorded.
+    :param room_key: Key of the private room to join, a public game is joined if it is not given.
+    :param create: Create a private room instead of joining one, its key is set on `room_created`.
+    """
 
-                elif event["type"] == "play":
-                    oper = int(input("input your move: "))
+    def __init__(self, name: str, stats: LatencyStats, room_key: asyncio.Future = None, create: bool = False):
+        self.name = name
+        self.stats = stats
+        self.room_key = room_key
+        self.create = create
+        self.room_created: asyncio.Future = asyncio.get_running_loop().create_future() if create else None
 
-                    await websocket.send(encode_json(oper))
-                elif event["type"] == "player_disconnect":
-                    print(event)
-                    # await websocket.send( encode_json(event) )
+        self.websocket: websockets.WebSocketClientProtocol = None
+        self.player: str = None
+        self.room: str = None
+        self.rounds_played = 0
+        # the state of the room, from the snapshot and the deltas sent by the server
+        self.state = StateMirror()
 
-        except websockets.exceptions.ConnectionClosedError:
-            print("server close connect")
+        # events pushed by the server while waiting for the reply to a request
+        self._backlog: collections.deque[dict] = collections.deque()
+
+    async def play(self, uri: str = SERVER_URI) -> bool:
+        """Play one game from connecting to the last round, returns False if it ended early."""
+        try:
+            await self.connect(uri)
+            await self._enter_room()
+            return await self._play_rounds()
+        except websockets.exceptions.ConnectionClosed:
+            return False
         finally:
-            print("connect close")
+            if self.websocket is not None:
+                await self.websocket.close()
+
+    async def connect(self, uri: str) -> None:
+        """Open the connection to the server, closing the previous one."""
+        if self.websocket is not None:
+            await self.websocket.close()
+        start = time.perf_counter()
+        self.websocket = await websockets.connect(uri)
+        self.stats.record("handshake", time.perf_counter() - start)
+
+    async def request(self, event: dict, *reply_types: str) -> dict:
+        """
+        Send an event and wait for its reply, the events pushed in the meantime are kept for later.
+
+        When the server redirects the bot to the worker holding its room, the event is sent again to that worker.
+        """
+        start = time.perf_counter()
+        await self.websocket.send(encode_json(event))
+        while True:
+            reply = decode_json(await self.websocket.recv())
+            if reply["type"] == "redirect":
+                await self.connect(reply["uri"])
+                await self.websocket.send(encode_json(event))
+            elif reply["type"] in reply_types or reply["type"] == "error":
+                self.stats.record(event["type"], time.perf_counter() - start)
+                return reply
+            else:
+                self._backlog.append(reply)
+
+    async def next_event(self) -> dict:
+        """Next event pushed by the server."""
+        if self._backlog:
+            return self._backlog.popleft()
+        return decode_json(await self.websocket.recv())
+
+    async def _enter_room(self) -> None:
+        if self.create:
+            reply = await self.request({"type": "create", "player": None, "player_name": self.name}, "init")
+            self.player = reply["player"]
+            self.room = reply["room_key"]
+            self.room_created.set_result(self.room)
+        else:
+            event = {"type": "join", "player": None, "player_name": self.name}
+            if self.room_key is not None:
+                event["room_key"] = await self.room_key
+            reply = await self.request(event, "init", "player_join")
+            self.player = reply["player"]
+            self.room = reply.get("room", reply.get("room_key"))
+
+        # wait until the room is full
+        start = time.perf_counter()
+        while not (await self.next_event()).get("started"):
+            pass
+        self.stats.record("room_fill", time.perf_counter() - start)
+
+    async def _sync(self, event: dict) -> bool:
+        """Apply a state event, asking for the changes that were missed if it doesn't follow on, False on an error."""
+        while event["type"] != "error":
+            if self.state.apply(event):
+                return True
+            event = await self.request({"type": "turn_status_pub", "room": self.room, "seq": self.state.seq},
+                                       "state", "state_delta")
+        return False
+
+    async def _play_rounds(self) -> bool:
+        if not await self._sync(await self.request({"type": "get_reaction_pub", "room": self.room}, "state")):
+            return False
+        seat = self.state.seat(self.player)
+        picked_round = None
+        while True:
+            state = self.state.fields
+            self.rounds_played = state["round"]
+            if self.rounds_played == MAX_ROUNDS:
+                return True
+            if state["turn"] == seat and picked_round != state["round"]:
+                event = {
+                    "type": "select_option_pub",
+                    "room": self.room,
+                    "index": seat,
+                    "option": random.choice(reaction_by_key(state["reaction"]).options(seat, state["variant"])),
+                    "turn": seat + 1,
+                }
+                await self.request(event, "option_reply")
+                picked_round = state["round"]
+
+            event = await self.next_event()
+            match event["type"]:
+                case "state" | "state_delta":
+                    if not await self._sync(event):
+                        return False
+                case "player_disconnect" | "error":
+                    return False
+
+
+async def play_one_game() -> list[bool]:
+    """Fill one public room with bots and play its game."""
+    stats = LatencyStats()
+    return await asyncio.gather(*(Bot(f"bot-{seat}", stats).play() for seat in range(ROOM_SIZE)))
 
 
-asyncio.run(client())
+if __name__ == "__main__":
+    print("game played:", asyncio.run(play_one_game()))
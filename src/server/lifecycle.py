@@ -0,0 +1,87 @@
+"""Contains the lifecycle of a room and the reaper that evicts the rooms nobody plays in anymore."""
+
+import asyncio
+import enum
+import time
+from typing import Callable, Iterable
+
+from config import (
+    REAPER_INTERVAL, ROOM_CLOSED_TTL, ROOM_EMPTY_TTL, ROOM_IDLE_TTL
+)
+from server.log import get_logger
+
+log = get_logger("chemystery.server.lifecycle")
+
+
+class RoomState(enum.Enum):
+    """State of a room, from the moment it is created to the moment its game is over."""
+
+    WAITING = "waiting"
+    PLAYING = "playing"
+    FINISHED = "finished"
+    ABANDONED = "abandoned"
+
+
+class RoomReaper:
+    """
+    Periodically evicts the rooms that are closed or idle.
+
+    A finished or abandoned room is evicted `closed_ttl` seconds after its last activity, any other room once it has
+    been idle for `idle_ttl` seconds, or `empty_ttl` seconds if nobody is in it.
+
+    :param rooms: The dictionaries of live rooms, by room key. Rooms need `state` and `last_activity` attributes.
+    :param evict: Called with every room to evict, it must release the room and remove it from `rooms`.
+    :param idle_ttl: Seconds without activity after which a room is abandoned.
+    :param closed_ttl: Seconds a finished or abandoned room is kept around.
+    :param empty_ttl: Seconds without activity after which a room nobody is in is abandoned.
+    :param interval: Seconds between two sweeps.
+    """
+
+    def __init__(self, rooms: Iterable[dict], evict: Callable, idle_ttl: float = ROOM_IDLE_TTL,
+                 closed_ttl: float = ROOM_CLOSED_TTL, empty_ttl: float = ROOM_EMPTY_TTL,
+                 interval: float = REAPER_INTERVAL):
+        self.rooms = tuple(rooms)
+        self.evict = evict
+        self.idle_ttl = idle_ttl
+        self.closed_ttl = closed_ttl
+        self.empty_ttl = empty_ttl
+        self.interval = interval
+
+        self.reaped: dict[RoomState, int] = dict.fromkeys(RoomState, 0)
+
+    def stats(self) -> dict[str, int]:
+        """Counts of the live rooms by state and of the rooms reaped so far."""
+        stats = {f"live_{state.value}": 0 for state in RoomState}
+        for rooms in self.rooms:
+            for room in rooms.values():
+                stats[f"live_{room.state.value}"] += 1
+        stats["live"] = sum(len(rooms) for rooms in self.rooms)
+        stats.update({f"reaped_{state.value}": count for state, count in self.reaped.items()})
+        stats["reaped"] = sum(self.reaped.values())
+        return stats
+
+    def sweep(self, now: float = None) -> int:
+        """Evict every room that is due and return how many were evicted."""
+        now = time.monotonic() if now is None else now
+        due = []
+        for rooms in self.rooms:
+            for room in rooms.values():
+                idle = now - room.last_activity
+                if room.state in (RoomState.FINISHED, RoomState.ABANDONED):
+                    if idle >= self.closed_ttl:
+                        due.append(room)
+                elif idle >= self.idle_ttl or (not len(room) and idle >= self.empty_ttl):
+                    room.state = RoomState.ABANDONED
+                    due.append(room)
+
+        for room in due:
+            self.reaped[room.state] += 1
+            self.evict(room)
+        return len(due)
+
+    async def run(self) -> None:
+        """Sweep the rooms every `interval` seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            if reaped := self.sweep():
+                log.info("rooms reaped", count=reaped, **self.stats())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+Load tester, runs a swarm of bots playing whole games against a local server.
+
+Run with `python -m server.loadtest --bots 200` from the `src` directory while `python server.py` is running.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from config import ROOM_SIZE, SERVER_URI
+from server.client import Bot, LatencyStats
+
+
+def make_bots(bots: int, private: float, stats: LatencyStats) -> list[Bot]:
+    """Group the bots in parties of ROOM_SIZE, a `private` fraction of the parties play in private rooms."""
+    swarm = []
+    for party in range(bots // ROOM_SIZE):
+        names = [f"bot-{party}-{seat}" for seat in range(ROOM_SIZE)]
+        if random.random() < private:
+            owner = Bot(names[0], stats, create=True)
+            swarm.append(owner)
+            swarm.extend(Bot(name, stats, room_key=owner.room_created) for name in names[1:])
+        else:
+            swarm.extend(Bot(name, stats) for name in names)
+    return swarm
+
+
+def report(stats: LatencyStats, elapsed: float, games: int, failed: int) -> None:
+    """Print the throughput and the latency percentiles of every event type."""
+    events = sum(len(samples) for event_type, samples in stats.samples.items() if event_type != "room_fill")
+    print(f"{games} players finished their game, {failed} did not, in {elapsed:.2f}s")
+    print(f"{events / elapsed:.0f} events/s\n")
+    print(f"{'event':<20} {'count':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for event_type in sorted(stats.samples):
+        percentiles = (stats.percentile(event_type, percent) * 1000 for percent in (50, 95, 99))
+        print(f"{event_type:<20} {len(stats.samples[event_type]):>8}", *(f"{ms:>10.2f}" for ms in percentiles))
+
+
+async def run(bots: int, private: float, uri: str, timeout: float) -> None:
+    """Start every bot at once and report once they are all done."""
+    stats = LatencyStats()
+    swarm = make_bots(bots, private, stats)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(asyncio.wait_for(bot.play(uri), timeout) for bot in swarm),
+                                   return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    games = sum(result is True for result in results)
+    report(stats, elapsed, games, len(results) - games)
+
+
+def main():
+    """Parse the command line and run the swarm."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bots", type=int, default=100, help="number of bots, rounded down to full rooms")
+    parser.add_argument("--private", type=float, default=0.5, help="fraction of the rooms that are private")
+    parser.add_argument("--uri", default=SERVER_URI, help="uri of the server")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds a bot gets to play its game")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random options and room types")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(run(args.bots, args.private, args.uri, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Contains the structured logging of the server.
+
+Records are handed to a queue and formatted and written by a background thread, so the event loop never waits on
+stdout. Disabled levels return before anything is built, and the records of chatty event types can be sampled.
+"""
+
+import collections
+import logging
+import logging.handlers
+import queue
+import sys
+
+from config import LOG_LEVEL, LOG_SAMPLE_RATES
+
+
+class StructuredLogger:
+    """
+    Logger taking the fields of a record as keyword arguments, e.g. `log.info("room created", room=room_key)`.
+
+    The field `event_type` is used to sample the records, see `SamplingFilter`.
+    """
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+
+    def is_enabled(self, level: int) -> bool:
+        """Whether records of that level are logged, to skip building costly fields altogether."""
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level: int, message: str, **fields) -> None:
+        """Log a record with its fields, nothing is built if the level is disabled."""
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, extra={"fields": fields})
+
+    def debug(self, message: str, **fields) -> None:
+        """Log a debug record."""
+        self.log(logging.DEBUG, message, **fields)
+
+    def info(self, message: str, **fields) -> None:
+        """Log an info record."""
+        self.log(logging.INFO, message, **fields)
+
+    def warning(self, message: str, **fields) -> None:
+        """Log a warning record."""
+        self.log(logging.WARNING, message, **fields)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one record in `1 / rate` for the event types that have a sampling rate, every record of the others.
+
+    :param rates: Sampling rate by event type, between 0 (drop every record) and 1 (keep every record).
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.every = {event_type: round(1 / rate) if rate else 0 for event_type, rate in rates.items()}
+        self.seen: collections.Counter[str] = collections.Counter()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Whether the record is kept."""
+        event_type = getattr(record, "fields", {}).get("event_type")
+        every = self.every.get(event_type, 1)
+        if every == 1:
+            return True
+        if not every:
+            return False
+        self.seen[event_type] += 1
+        return self.seen[event_type] % every == 1
+
+
+class LogfmtFormatter(logging.Formatter):
+    """Formats a record and its fields as `key=value` pairs."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the record, on the thread of the queue listener."""
+        fields = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        line = " ".join(f"{key}={self.quote(value)}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+    @staticmethod
+    def quote(value) -> str:
+        """Quote the values that contain spaces."""
+        value = str(value)
+        return f'"{value}"' if " " in value or not value else value
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Hands the records to the queue as they are, the formatting is left to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Nothing to prepare, the listener lives in the same process."""
+        return record
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Structured logger of a module of the server."""
+    return StructuredLogger(name)
+
+
+def setup_logging(level: str = LOG_LEVEL, sample_rates: dict[str, float] = LOG_SAMPLE_RATES,
+                  stream=sys.stdout) -> logging.handlers.QueueListener:
+    """
+    Send the records of the server to `stream` through a queue and a background writer.
+
+    :return: The started listener, stop it to flush the remaining records.
+    """
+    records = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger("chemystery")
+    root.setLevel(level)
+    root.addHandler(handler)
+    root.propagate = False
+
+    writer = logging.StreamHandler(stream)
+    writer.setFormatter(LogfmtFormatter())
+    listener = logging.handlers.QueueListener(records, writer)
+    listener.start()
+    return listener
@@ -0,0 +1,65 @@
+"""Contains the index of the public rooms that still have free seats."""
+
+from collections import OrderedDict
+
+from config import ROOM_SIZE
+
+
+class MatchmakingIndex:
+    """
+    Index of the open public rooms, keyed by their number of free seats.
+
+    Claiming a seat looks at one bucket per possible number of free seats, so it does not depend on the number of live
+    rooms. The index is only used from the event loop of the server and never awaits, so a seat is claimed and taken
+    in one step and concurrent joins can't over-fill a room.
+
+    :param room_size: Number of players in a full room.
+    """
+
+    def __init__(self, room_size: int = ROOM_SIZE):
+        self.room_size = room_size
+
+        # free seats -> room keys with that many free seats, oldest room first
+        self._buckets: list[OrderedDict[str, None]] = [OrderedDict() for _ in range(room_size + 1)]
+        self._free_seats: dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._free_seats)
+
+    def __contains__(self, room_key: str):
+        return room_key in self._free_seats
+
+    def free_seats(self, room_key: str) -> int:
+        """Number of free seats in an open room, 0 if the room is not open."""
+        return self._free_seats.get(room_key, 0)
+
+    def add(self, room_key: str, free_seats: int) -> None:
+        """Open a room with the given number of free seats, or update the free seats of an open room."""
+        self.discard(room_key)
+        if free_seats > 0:
+            self._free_seats[room_key] = free_seats
+            self._buckets[free_seats][room_key] = None
+
+    def discard(self, room_key: str) -> None:
+        """Remove a room from the index, e.g. once its game started or the room was closed."""
+        free_seats = self._free_seats.pop(room_key, 0)
+        if free_seats:
+            del self._buckets[free_seats][room_key]
+
+    def claim(self) -> str | None:
+        """
+        Take a seat in the fullest open room and return its key.
+
+        Returns None when there is no open room. A room is removed from the index once its last seat is claimed.
+        """
+        for free_seats in range(1, self.room_size + 1):
+            bucket = self._buckets[free_seats]
+            if bucket:
+                room_key = next(iter(bucket))
+                self.add(room_key, free_seats - 1)
+                return room_key
+        return None
+
+    def release(self, room_key: str) -> None:
+        """Give back a seat of a room that a waiting player left."""
+        self.add(room_key, min(self.free_seats(room_key) + 1, self.room_size))
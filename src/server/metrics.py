@@ -0,0 +1,139 @@
+"""
+Contains the metrics of the server and the http endpoint they are scraped from, in the Prometheus text format.
+
+Recording a metric is a counter increment, the gauges are only read when the endpoint is scraped.
+"""
+
+import asyncio
+import bisect
+import collections
+from typing import Callable, Iterable
+
+from config import METRICS_PORT
+
+# upper bounds of the buckets of the histograms, in seconds for the latencies and in players for the fanouts
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+FANOUT_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+class Histogram:
+    """
+    Distribution of the observed values in cumulative buckets.
+
+    :param buckets: Upper bounds of the buckets, in ascending order. A last bucket without a bound holds every value.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def samples(self, name: str, labels: str = "") -> list[str]:
+        """The lines of the histogram in the exposition format, `labels` being the ones shared by every line."""
+        separator = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+        labels = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{labels} {self.sum}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class Metrics:
+    """
+    Counters and histograms recorded by the server, and the gauges read from its state when scraped.
+
+    Attributes:
+        :events: Number of events handled, by event type.
+        :latency: Time spent handling the events, by event type.
+        :fanout: Number of players each message sent to a whole room went to.
+    """
+
+    def __init__(self):
+        self.events: collections.Counter[str] = collections.Counter()
+        self.latency: dict[str, Histogram] = collections.defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.fanout = Histogram(FANOUT_BUCKETS)
+        self._gauges: dict[str, tuple[str, Callable[[], float]]] = {}
+        self._collectors: list[tuple[str, str, Callable[[], dict[str, float]], frozenset[str]]] = []
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]) -> None:
+        """Expose the value returned by `read` as the gauge `name`."""
+        self._gauges[name] = (description, read)
+
+    def collect(self, prefix: str, description: str, read: Callable[[], dict[str, float]],
+                counters: Iterable[str] = ()) -> None:
+        """
+        Expose every value of the dictionary returned by `read`, named after its key.
+
+        :param counters: The keys whose values only ever grow, they are counters named with a `_total` suffix and the
+            other values are gauges.
+        """
+        self._collectors.append((prefix, description, read, frozenset(counters)))
+
+    def observe_event(self, event_type: str, seconds: float) -> None:
+        """Record an event that was handled in `seconds`."""
+        self.events[event_type] += 1
+        self.latency[event_type].observe(seconds)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, (description, read) in self._gauges.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        for prefix, description, read, counters in self._collectors:
+            for key, value in read().items():
+                name, kind = (f"{prefix}_{key}_total", "counter") if key in counters else (f"{prefix}_{key}", "gauge")
+                lines += [f"# HELP {name} {description}: {key.replace('_', ' ')}.", f"# TYPE {name} {kind}",
+                          f"{name} {value}"]
+
+        lines += ["# HELP chemystery_events_total Events handled.", "# TYPE chemystery_events_total counter"]
+        lines += [f'chemystery_events_total{{type="{event_type}"}} {count}'
+                  for event_type, count in self.events.items()]
+
+        lines += ["# HELP chemystery_event_seconds Time spent handling an event.",
+                  "# TYPE chemystery_event_seconds histogram"]
+        for event_type, histogram in self.latency.items():
+            lines += histogram.samples("chemystery_event_seconds", f'type="{event_type}"')
+
+        lines += ["# HELP chemystery_fanout_players Players a message sent to a whole room went to.",
+                  "# TYPE chemystery_fanout_players histogram"]
+        lines += self.fanout.samples("chemystery_fanout_players")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host: str = "", port: int = METRICS_PORT) -> asyncio.AbstractServer:
+        """Start the http endpoint, the metrics are served at `/metrics`."""
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # the headers are not needed, they are read up to the blank line that ends them
+            while (await reader.readline()).strip():
+                pass
+
+            parts = request_line.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1].split(b"?")[0] == b"/metrics":
+                status, body = "200 OK", self.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
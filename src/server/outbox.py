@@ -0,0 +1,130 @@
+"""
+Contains the outbox of a client, the bounded queue of the messages the server sends it.
+
+Messages are queued without waiting and a writer task of the client sends them in order, so a player whose connection
+is slow only ever delays their own messages. What happens once the queue is full is up to its policy.
+"""
+
+import asyncio
+import collections
+from typing import Callable
+
+import websockets.exceptions
+
+from config import OUTBOX_POLICY, OUTBOX_SIZE
+
+POLICIES = ("coalesce", "drop_oldest", "disconnect")
+# kind of the replies to the requests of the client, it waits for them so they are never dropped
+REPLY = "reply"
+
+
+class Outbox:
+    """
+    Bounded queue of the messages to send to one client, drained by its own writer task.
+
+    When the queue is full:
+        - "coalesce" replaces the queued messages of the same kind, only the latest state of it matters, and drops the
+          oldest pushed message when none has that kind.
+        - "drop_oldest" drops the oldest pushed message.
+        - "disconnect" closes the connection of the client, it can't keep up.
+    The replies are never dropped, the queue holds more messages than `maxsize` if they are all replies.
+
+    :param websocket: Connection of the client.
+    :param counters: Shared by every outbox, counts the messages coalesced or dropped and the clients disconnected.
+    :param policy: One of `POLICIES`.
+    :param maxsize: Number of messages the queue holds.
+    """
+
+    def __init__(self, websocket, counters: collections.Counter, policy: str = OUTBOX_POLICY,
+                 maxsize: int = OUTBOX_SIZE):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown outbox policy {policy!r}")
+        self.websocket = websocket
+        self.counters = counters
+        self.policy = policy
+        self.maxsize = maxsize
+        self.closed = False
+
+        # (kind, message) pairs, the kind is REPLY for the replies and None for the pushed messages never coalesced
+        self._queue: collections.deque[tuple[str | None, str | bytes]] = collections.deque()
+        # number of replies in the queue, when they are all there is no pushed message to drop
+        self._replies = 0
+        self._ready = asyncio.Event()
+        self._writer: asyncio.Task = None
+        self._closing: asyncio.Task = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def start(self) -> None:
+        """Start the writer task, on the running event loop."""
+        self._writer = asyncio.create_task(self._write())
+
+    def put(self, message: str | bytes, kind: str | None = REPLY, latest: Callable[[], str | bytes] = None) -> None:
+        """
+        Queue a message, without waiting.
+
+        :param kind: `REPLY` for the reply to a request of the client. Otherwise the kind of a message pushed by the
+            server, a newer message of the same kind can replace it when the queue is full, None if none can.
+        :param latest: Makes the message replacing the queued messages of the kind instead of this one, e.g. the
+            snapshot of the state this delta and the queued ones lead to.
+        """
+        if self.closed:
+            return
+        if len(self._queue) >= self.maxsize and not self._make_room(kind, message, latest):
+            return
+        self._queue.append((kind, message))
+        self._replies += kind == REPLY
+        self._ready.set()
+
+    async def close(self) -> None:
+        """Stop the writer task, the messages left are not sent."""
+        self.closed = True
+        self._queue.clear()
+        self._replies = 0
+        if self._writer is not None:
+            self._writer.cancel()
+        await asyncio.gather(*(task for task in (self._writer, self._closing) if task), return_exceptions=True)
+
+    def _make_room(self, kind: str | None, message: str | bytes, latest: Callable[[], str | bytes] | None) -> bool:
+        """Apply the policy to a full queue, returns whether `message` still has to be queued."""
+        if self.policy == "coalesce" and kind not in (None, REPLY):
+            queued = [position for position, (queued_kind, _) in enumerate(self._queue) if queued_kind == kind]
+            if queued:
+                # the oldest message of the kind takes the place of all of them
+                self._queue[queued[0]] = (kind, latest() if latest else message)
+                for position in reversed(queued[1:]):
+                    del self._queue[position]
+                self.counters["coalesced"] += len(queued)
+                return False
+        if self.policy == "disconnect":
+            self.closed = True
+            self._queue.clear()
+            self._replies = 0
+            self.counters["disconnected"] += 1
+            # the writer may be stuck on the slow connection, it stops once the connection is closed
+            self._closing = asyncio.create_task(self.websocket.close(code=1013, reason="too slow to keep up"))
+            return False
+        if len(self._queue) > self._replies:
+            for position, (queued_kind, _) in enumerate(self._queue):
+                if queued_kind != REPLY:
+                    del self._queue[position]
+                    self.counters["dropped"] += 1
+                    return True
+        # every queued message is a reply
+        if kind != REPLY:
+            self.counters["dropped"] += 1
+            return False
+        return True
+
+    async def _write(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    kind, message = self._queue.popleft()
+                    self._replies -= kind == REPLY
+                    await self.websocket.send(message)
+                self._ready.clear()
+        except websockets.exceptions.ConnectionClosed:
+            self.closed = True
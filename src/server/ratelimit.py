@@ -0,0 +1,66 @@
+"""Contains the token bucket rate limiter of the events the clients send."""
+
+import collections
+import time
+
+from config import RATE_LIMIT_EXEMPT
+
+
+class RateLimiter:
+    """
+    Token buckets by key, e.g. a connection or a remote address, with a separate budget for every event type.
+
+    A bucket holds up to `burst` tokens and gets `rate` of them back every second, an event takes one token and is
+    throttled when the bucket is empty. A bucket left alone long enough to be full again is dropped, so the limiter
+    only keeps the buckets of the keys that are active.
+
+    :param budgets: The `(rate, burst)` budget of each event type, the event types not listed are never throttled.
+    :param exempt: Keys that are never throttled.
+    """
+
+    def __init__(self, budgets: dict[str, tuple[float, float]], exempt: tuple[str, ...] = RATE_LIMIT_EXEMPT):
+        self.budgets = budgets
+        self.exempt = frozenset(exempt)
+        # time after which any bucket is full again, whatever its budget
+        self.ttl = max((burst / rate for rate, burst in budgets.values()), default=0)
+        # [tokens, last update] by (key, event type), the least recently used first
+        self._buckets: collections.OrderedDict[tuple[str, str], list[float]] = collections.OrderedDict()
+        self.throttled = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def allow(self, key: str, event_type: str, now: float = None) -> bool:
+        """Take a token for an event of that type, returns False if the event is throttled."""
+        budget = self.budgets.get(event_type)
+        if budget is None or key in self.exempt:
+            return True
+        rate, burst = budget
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        bucket = self._buckets.get((key, event_type))
+        if bucket is None:
+            bucket = self._buckets[key, event_type] = [burst, now]
+        else:
+            self._buckets.move_to_end((key, event_type))
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] < 1:
+            self.throttled += 1
+            return False
+        bucket[0] -= 1
+        return True
+
+    def stats(self) -> dict[str, int]:
+        """Number of buckets kept and of events throttled."""
+        return {"buckets": len(self._buckets), "throttled": self.throttled}
+
+    def _expire(self, now: float) -> None:
+        """Drop the buckets that are full again, the least recently used are checked first."""
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < self.ttl:
+                return
+            del self._buckets[key]
@@ -0,0 +1,72 @@
+"""Contains the resume tokens of the players, and the seats held for the players whose connection dropped."""
+
+import asyncio
+import secrets
+from typing import Callable
+
+from config import RESUME_GRACE
+
+
+class Sessions:
+    """
+    Resume tokens of the seated players, a player whose connection drops can take their seat back with theirs.
+
+    A player gets a token once seated and a new one every time they resume, the previous one is no longer valid. When
+    the connection of a player drops, their seat is held for `grace` seconds, after which `release` is called with them
+    unless they resumed.
+
+    :param release: Called with a player whose seat was held and who did not resume in time.
+    :param grace: Seconds a seat is held, 0 never holds it.
+
+    Attributes:
+        :held: Timers of the seats held, by resume token.
+    """
+
+    def __init__(self, release: Callable, grace: float = RESUME_GRACE):
+        self.release = release
+        self.grace = grace
+
+        # the player of every valid token, the players need a `resume_token` attribute
+        self._players: dict = {}
+        self.held: dict[str, asyncio.TimerHandle] = {}
+
+    def __len__(self):
+        return len(self._players)
+
+    def issue(self, player) -> str:
+        """Give a player a new token, instead of the one they had."""
+        self.revoke(player)
+        player.resume_token = secrets.token_urlsafe(16)
+        self._players[player.resume_token] = player
+        return player.resume_token
+
+    def hold(self, player) -> bool:
+        """Hold the seat of a player whose connection dropped, returns False if it is not held and can be freed."""
+        token = getattr(player, "resume_token", None)
+        if not self.grace or token not in self._players:
+            return False
+        self.held[token] = asyncio.get_running_loop().call_later(self.grace, self._expire, player)
+        return True
+
+    def claim(self, token: str):
+        """The player of a token, who takes their seat back, or None if the token is not valid."""
+        player = self._players.get(token)
+        if player is not None and (timer := self.held.pop(token, None)):
+            timer.cancel()
+        return player
+
+    def revoke(self, player) -> None:
+        """Forget the token of a player, e.g. once they left their room."""
+        token = getattr(player, "resume_token", None)
+        self._players.pop(token, None)
+        if timer := self.held.pop(token, None):
+            timer.cancel()
+
+    def stats(self) -> dict[str, int]:
+        """Number of valid tokens and of seats held."""
+        return {"tokens": len(self._players), "held": len(self.held)}
+
+    def _expire(self, player) -> None:
+        self.held.pop(player.resume_token, None)
+        self._players.pop(player.resume_token, None)
+        self.release(player)
@@ -0,0 +1,70 @@
+"""
+Contains the sharding of the rooms across the worker processes of the server.
+
+Every room key belongs to one worker, picked from the hash of the key, so every player of a room ends up on the
+process that holds it. Workers share the port the clients connect to, and each one also listens on a port of its own,
+which is where a player is redirected to when they connected to another worker than the one holding their room.
+"""
+
+import multiprocessing.sharedctypes
+import secrets
+import zlib
+
+from config import WORKER_PORT
+
+
+def owner(room_key: str, workers: int) -> int:
+    """Index of the worker a room key belongs to, the same in every process."""
+    return zlib.crc32(room_key.encode()) % workers
+
+
+class ShardMap:
+    """
+    Which worker holds which room, as seen from one worker.
+
+    The number of open public rooms of every worker is shared through an array in shared memory, a local stand-in
+    for the store a server spread over several machines would use.
+
+    :param index: Index of the worker of this process.
+    :param workers: Number of workers.
+    :param open_rooms: Number of public rooms with a free seat, by worker. Not needed with a single worker.
+    :param host: Host the clients reach the workers at.
+    """
+
+    def __init__(self, index: int = 0, workers: int = 1, open_rooms: multiprocessing.sharedctypes.Array = None,
+                 host: str = "localhost"):
+        self.index = index
+        self.workers = workers
+        self.open_rooms = open_rooms
+        self.host = host
+
+    def owns(self, room_key: str) -> bool:
+        """Whether the room belongs to this worker."""
+        return self.workers == 1 or owner(room_key, self.workers) == self.index
+
+    def new_room_key(self) -> str:
+        """A new random room key that belongs to this worker, found in `workers` tries on average."""
+        while not self.owns(room_key := secrets.token_urlsafe(6)):
+            pass
+        return room_key
+
+    def uri(self, worker: int) -> str:
+        """Uri of the port of its own a worker listens on."""
+        return f"ws://{self.host}:{WORKER_PORT + worker}"
+
+    def owner_uri(self, room_key: str) -> str:
+        """Uri of the worker a room key belongs to."""
+        return self.uri(owner(room_key, self.workers))
+
+    def publish_open_rooms(self, count: int) -> None:
+        """Share the number of public rooms of this worker that have a free seat."""
+        if self.open_rooms is not None:
+            self.open_rooms[self.index] = count
+
+    def worker_with_open_room(self) -> int | None:
+        """Another worker with a public room waiting for players, the one with the most of them."""
+        if self.open_rooms is None:
+            return None
+        counts = [(count, worker) for worker, count in enumerate(self.open_rooms[:]) if worker != self.index]
+        count, worker = max(counts, default=(0, None))
+        return worker if count else None
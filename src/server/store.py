@@ -0,0 +1,165 @@
+"""
+Contains the stores the server keeps its clients and rooms in.
+
+The clients and the rooms hold live connections, so both stores keep them in memory and every lookup is a dictionary
+access. The SQLite store also writes a snapshot of every changed room to disk in the background, batched in one
+transaction, so the rooms can be recovered after a restart or read by another process.
+"""
+
+import asyncio
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+
+from config import ROOM_STORE, ROOM_STORE_PATH, STORE_FLUSH_INTERVAL
+
+
+class RoomStore:
+    """
+    In-memory store of the clients and the rooms of the server.
+
+    Clients need a `client_id`, rooms a `room_key`, a `private` flag and a `snapshot()` returning a json serializable
+    dict.
+
+    Attributes:
+        :clients: The online clients, by id.
+        :public_rooms: The public rooms, by key.
+        :private_rooms: The private rooms, by key.
+    """
+
+    def __init__(self):
+        self.clients: dict = {}
+        self.public_rooms: dict = {}
+        self.private_rooms: dict = {}
+
+    def open(self) -> None:
+        """Open the store, before the server starts. Nothing to open in memory."""
+
+    def room(self, room_key: str):
+        """The public or private room with that key."""
+        return self.public_rooms.get(room_key) or self.private_rooms.get(room_key)
+
+    def add_client(self, client) -> None:
+        """Register a client that connected."""
+        self.clients[client.client_id] = client
+
+    def remove_client(self, client_id: str) -> None:
+        """Forget a client that disconnected."""
+        del self.clients[client_id]
+
+    def add_room(self, room) -> None:
+        """Register a new room."""
+        rooms = self.private_rooms if room.private else self.public_rooms
+        rooms[room.room_key] = room
+        self.save(room)
+
+    def remove_room(self, room) -> None:
+        """Forget a room."""
+        rooms = self.private_rooms if room.private else self.public_rooms
+        rooms.pop(room.room_key, None)
+
+    def save(self, room) -> None:
+        """Record that a room changed, nothing to do in memory."""
+
+    def recover(self) -> list[dict]:
+        """Snapshots of the rooms saved before a restart, none in memory."""
+        return []
+
+    def stats(self) -> dict[str, int]:
+        """Counters of the writes of the store, none in memory."""
+        return {}
+
+    async def run(self) -> None:
+        """Write the changes in the background until cancelled, nothing to do in memory."""
+
+    def close(self) -> None:
+        """Write the changes that are left and release the store."""
+
+
+class SQLiteRoomStore(RoomStore):
+    """
+    Store keeping the rooms in memory and writing their snapshots behind to a SQLite database.
+
+    Changed rooms are only marked when they change, their snapshots are taken and written together every `interval`
+    seconds, in a single transaction run on a thread. The database is in WAL mode so other processes can read it while
+    the server writes.
+
+    :param path: Path of the database, shared by every worker of the server.
+    :param interval: Seconds between two batches of writes.
+    """
+
+    def __init__(self, path: pathlib.Path = ROOM_STORE_PATH, interval: float = STORE_FLUSH_INTERVAL):
+        super().__init__()
+        self.path = path
+        self.interval = interval
+        self.db: sqlite3.Connection = None
+        # rooms changed since the last batch, None for the ones removed
+        self._dirty: dict = {}
+        # the last batch can still be written on its thread when the store is closed
+        self._writing = threading.Lock()
+        self.batches = 0
+
+    def open(self) -> None:
+        """Connect to the database, in the process of the worker that uses it."""
+        self.db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS rooms "
+                        "(room_key TEXT PRIMARY KEY, snapshot TEXT NOT NULL, updated REAL NOT NULL)")
+
+    def remove_room(self, room) -> None:
+        """Forget a room, it is deleted with the next batch."""
+        super().remove_room(room)
+        self._dirty[room.room_key] = None
+
+    def save(self, room) -> None:
+        """Mark the room to be written with the next batch."""
+        self._dirty[room.room_key] = room
+
+    def recover(self) -> list[dict]:
+        """Snapshots of the rooms saved before a restart."""
+        return [json.loads(snapshot) for snapshot, in self.db.execute("SELECT snapshot FROM rooms")]
+
+    def stats(self) -> dict[str, int]:
+        """Number of rooms waiting to be written, and of batches written."""
+        return {"pending": len(self._dirty), "batches": self.batches}
+
+    async def run(self) -> None:
+        """Write the changed rooms every `interval` seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._dirty:
+                await asyncio.to_thread(self._write, *self._take_batch())
+
+    def close(self) -> None:
+        """Write the changes that are left and close the database."""
+        self._write(*self._take_batch())
+        self.db.close()
+
+    def _take_batch(self) -> tuple[list[tuple[str, str, float]], list[tuple[str]]]:
+        """The rows to write and the keys to delete, the snapshots are taken on the event loop thread."""
+        dirty, self._dirty = self._dirty, {}
+        now = time.time()
+        rows = [(room_key, json.dumps(room.snapshot()), now) for room_key, room in dirty.items() if room is not None]
+        deleted = [(room_key,) for room_key, room in dirty.items() if room is None]
+        return rows, deleted
+
+    def _write(self, rows: list[tuple[str, str, float]], deleted: list[tuple[str]]) -> None:
+        with self._writing, self.db:
+            self.db.execute("BEGIN")
+            self.db.executemany("INSERT OR REPLACE INTO rooms VALUES (?, ?, ?)", rows)
+            self.db.executemany("DELETE FROM rooms WHERE room_key = ?", deleted)
+        self.batches += 1
+
+
+def open_store(kind: str = ROOM_STORE) -> RoomStore:
+    """Open the store of that kind, "memory" or "sqlite"."""
+    match kind:
+        case "memory":
+            return RoomStore()
+        case "sqlite":
+            return SQLiteRoomStore()
+        case _:
+            raise ValueError(f"unknown room store {kind!r}")
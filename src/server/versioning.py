@@ -0,0 +1,68 @@
+"""Contains the versioned state of a room, sent to its players as one snapshot and then as deltas."""
+
+import collections
+from typing import Callable
+
+from config import STATE_HISTORY
+
+
+class VersionedState:
+    """
+    Fields of a room shared by all of its players, with a sequence number bumped by every change.
+
+    A player gets a snapshot of every field once, then a delta of the fields that changed with each new sequence
+    number. A player that missed some deltas asks for the ones after the last sequence number it has, they are merged
+    into one delta, or it gets a new snapshot once they are no longer kept.
+
+    The values of the fields are compared to find the changes, so they must not be mutated once updated, e.g. tuples
+    instead of lists.
+
+    :param encode: Function encoding a message dict to the string sent on the websocket.
+    :param history: Number of deltas kept for the players resyncing.
+    """
+
+    def __init__(self, encode: Callable[[dict], str], history: int = STATE_HISTORY):
+        self.encode = encode
+        self.seq = 0
+        self.fields: dict = {}
+
+        # (sequence number, changed fields) of the latest deltas, oldest first
+        self._deltas: collections.deque[tuple[int, dict]] = collections.deque(maxlen=history)
+        # the snapshot is encoded once per sequence number, whoever asks for it
+        self._snapshot: tuple[int, str] = (-1, "")
+
+    def update(self, fields: dict) -> str | None:
+        """
+        Set the fields to their current values, returns the encoded delta if any of them changed.
+
+        Nobody has a state before the first one, it is only sent as a snapshot and no delta is returned for it.
+        """
+        current = self.fields
+        changes = {name: value for name, value in fields.items() if name not in current or current[name] != value}
+        if not changes:
+            return None
+        current.update(changes)
+        self.seq += 1
+        self._deltas.append((self.seq, changes))
+        if self.seq == 1:
+            return None
+        # the delta follows on from the previous sequence number, its base is left out
+        return self.encode({"type": "state_delta", "seq": self.seq, "changes": changes})
+
+    def snapshot(self) -> str:
+        """Encoded snapshot of every field."""
+        seq, message = self._snapshot
+        if seq != self.seq:
+            message = self.encode({"type": "state", "seq": self.seq, "state": self.fields})
+            self._snapshot = (self.seq, message)
+        return message
+
+    def since(self, seq: int | None) -> str:
+        """Encoded update of a player that has the state at `seq`, a snapshot if it is None or too old."""
+        if seq is None or seq > self.seq or not self._deltas or seq < self._deltas[0][0] - 1:
+            return self.snapshot()
+        changes = {}
+        for delta_seq, delta in self._deltas:
+            if delta_seq > seq:
+                changes.update(delta)
+        return self.encode({"type": "state_delta", "base": seq, "seq": self.seq, "changes": changes})
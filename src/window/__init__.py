@@ -1,4 +1,4 @@
-from window.views import Menu
+from window.menu import Menu
 from window.window import Window
 
 __all__ = [
@@ -0,0 +1,93 @@
+"""
+Contains the asset manager of the client.
+
+Nothing is loaded when the client is imported. Textures are decoded on a background thread as soon as they are asked
+for and the views draw a loading state until they are ready, fonts are added when the first view is shown, and the
+music is streamed from its file once the first frame is drawn instead of being decoded whole.
+"""
+
+import concurrent.futures
+
+import arcade
+
+from config import (
+    ASSET_PATH, MUSIC_START, MUSIC_VOLUME, SCREEN_HEIGHT, SCREEN_WIDTH
+)
+
+# path of every texture and the size it is cropped to, 0 keeps the whole image
+TEXTURES = {
+    "menu_background": (ASSET_PATH / "backgrounds" / "menu_bg.jpg", SCREEN_WIDTH, SCREEN_HEIGHT),
+    "game_background": (ASSET_PATH / "backgrounds" / "game_bg.jpg", 0, 0),
+}
+FONTS = (
+    ASSET_PATH / "fonts" / "DiloWorld-mLJLv.ttf",
+    ASSET_PATH / "fonts" / "QuadratumUnum-LW0Z.ttf",
+)
+MUSIC = ASSET_PATH / "music" / "game_bg.wav"
+
+
+class Assets:
+    """
+    Textures, fonts and music of the client, loaded without holding up the first frame.
+
+    Attributes:
+        :music_player: Player of the background music, None until it is started or if there is no music file.
+    """
+
+    def __init__(self):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="assets")
+        self._textures: dict[str, concurrent.futures.Future] = {}
+        # sprite lists of the backgrounds, built on the main thread once their texture is decoded
+        self._backgrounds: dict[str, arcade.SpriteList] = {}
+        self._fonts_loaded = False
+        self.music_player = None
+
+    @property
+    def loading(self) -> bool:
+        """Whether some textures are still being decoded."""
+        return not all(future.done() for future in self._textures.values())
+
+    def preload(self, *names: str) -> None:
+        """Start decoding textures on the background thread, every texture if no name is given."""
+        for name in names or TEXTURES:
+            if name not in self._textures:
+                path, width, height = TEXTURES[name]
+                self._textures[name] = self._executor.submit(arcade.load_texture, str(path), width=width,
+                                                             height=height)
+
+    def texture(self, name: str) -> arcade.Texture | None:
+        """The texture called `name`, or None while it is being decoded."""
+        self.preload(name)
+        future = self._textures[name]
+        return future.result() if future.done() else None
+
+    def background(self, name: str) -> arcade.SpriteList | None:
+        """Sprite list stretching the texture `name` over the whole window, or None while it is being decoded."""
+        if name not in self._backgrounds:
+            texture = self.texture(name)
+            if texture is None:
+                return None
+            sprite = arcade.Sprite(texture=texture, center_x=SCREEN_WIDTH / 2, center_y=SCREEN_HEIGHT / 2,
+                                   hit_box_algorithm="None")
+            sprite.width, sprite.height = SCREEN_WIDTH, SCREEN_HEIGHT
+            self._backgrounds[name] = arcade.SpriteList()
+            self._backgrounds[name].append(sprite)
+        return self._backgrounds[name]
+
+    def load_fonts(self) -> None:
+        """Add the fonts of the client the first time it is called, on the main thread like the text using them."""
+        if not self._fonts_loaded:
+            for path in FONTS:
+                arcade.load_font(str(path))
+            self._fonts_loaded = True
+
+    def play_music(self) -> None:
+        """Stream the background music in a loop, the game is played without music if its file is missing."""
+        if self.music_player is not None or not MUSIC.exists():
+            return
+        self.music_player = arcade.Sound(str(MUSIC), streaming=True).play(volume=MUSIC_VOLUME, loop=True)
+        self.music_player.seek(MUSIC_START)
+
+    def close(self) -> None:
+        """Stop decoding the textures that are left."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
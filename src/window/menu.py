@@ -0,0 +1,97 @@
+"""
+Contains the menu, the first view of the client.
+
+Only arcade and its gui are imported with it, the views of a game and the networking they use are imported when the
+play button is first clicked.
+"""
+
+from random import randint
+
+import arcade
+import arcade.gui
+
+from config import SCREEN_WIDTH
+from window.style import (
+    FONT_COLOR_RED, STYLE_RED, STYLE_WHITE, draw_background
+)
+
+
+class Menu(arcade.View):
+    """
+    Menu view.
+
+    :param main_window: Main window in which the view is shown.
+    """
+
+    def __init__(self, main_window: arcade.Window):
+        super().__init__(main_window)
+        self.main_window = main_window
+
+        self.v_box = None
+        self.v_box_heading = None
+
+        self.manager = None
+        self.loading_text: arcade.Text = None
+
+    def on_show_view(self) -> None:
+        """Called when the current is switched to this view."""
+        self.setup()
+
+    def setup(self) -> None:
+        """Set up the game variables. Call to re-start the game."""
+        self.v_box = arcade.gui.UIBoxLayout(space_between=30)
+        self.v_box_heading = arcade.gui.UIBoxLayout()
+        self.manager = arcade.gui.UIManager()
+        self.manager.enable()
+
+        play_button = arcade.gui.UIFlatButton(text="PLAY", width=200, style=STYLE_WHITE)
+        play_button.on_click = self._on_click_play_button
+        create_lobby_button = arcade.gui.UIFlatButton(text="Create Lobby", width=200, style=STYLE_WHITE)
+        create_lobby_button.on_click = self._on_click_play_button
+        dummy_play_button = arcade.gui.UIFlatButton(text="Play", width=200, style=STYLE_RED)
+        dummy_play_button.on_click = self._on_click_dummy_play_button
+
+        self.v_box.add(play_button)
+        self.v_box.add(create_lobby_button)
+        self.v_box.add(dummy_play_button)
+
+        self.manager.add(
+            arcade.gui.UIAnchorWidget(
+                child=self.v_box
+            )
+        )
+        self.loading_text = arcade.Text("Loading...", SCREEN_WIDTH / 2, 40, FONT_COLOR_RED, font_size=16,
+                                        font_name="Dilo World", anchor_x="center")
+
+    def on_draw(self) -> None:
+        """Called when this view should draw, the menu can be used while the assets are loading."""
+        self.clear()
+
+        draw_background(self.main_window, "menu_background")
+        if self.main_window.assets.loading:
+            self.loading_text.draw()
+        self.manager.draw()
+
+    def _on_click_dummy_play_button(self, _: arcade.gui.UIOnClickEvent) -> None:
+        """
+        Do one of three things when the dummy play button is pressed.
+
+        [0] Open a URL using the `webbrowser` module. (The same module used by `import antigravity`)
+        [1] Close the window and exit python.
+        [2] Do both.
+        """
+        if (picked := randint(0, 2)) != 1:
+            import webbrowser
+
+            webbrowser.open_new("https://youtu.be/fujCdB93fpw")
+        if picked:
+            self.main_window.close()
+            arcade.exit()
+            raise SystemExit
+
+    def _on_click_play_button(self, _: arcade.gui.UIOnClickEvent) -> None:
+        # the game views and their networking are only imported once they are needed
+        from window.views import WaitingScreen
+
+        waiting_screen = WaitingScreen(self.main_window)
+        self.main_window.show_view(waiting_screen)
@@ -0,0 +1,177 @@
+"""Contains the websocket connection a client keeps open for its whole session."""
+
+import asyncio
+import collections
+import concurrent.futures
+import threading
+import time
+
+import websockets
+import websockets.exceptions
+
+from config import PERF_HISTORY, RESUME_GRACE, SERVER_URI
+from protocol import decode_json, encode_json
+
+# Type of the events the server answers a request with, by the type of the request.
+REPLY_TYPES = {
+    "join": ("init", "player_join"),
+    "create": ("init",),
+    "resume": ("resumed",),
+    "room_status": ("reply_room_status", "bad request"),
+    "get_reaction_pub": ("state",),
+    "turn_status_pub": ("state", "state_delta"),
+    "select_option_pub": ("option_reply",),
+}
+
+
+class Connection:
+    """
+    A single websocket connection to the server, shared by every view of a client session.
+
+    The connection is driven by an event loop running on a background thread, so it stays open while the window
+    switches between views and the frames are never held up by the network. Requests are sent with `send` without
+    waiting, the replies and the events pushed by the server are queued in `received` in the order they arrived and
+    the views take them from it once per frame. If the connection drops once the player is seated, a new one is opened
+    and the player takes their seat back with the resume token the server sent, the requests wait for it meanwhile.
+
+    :param uri: Uri of the websocket server.
+
+    Attributes:
+        :received: (request, event) of every event received, the request it is the reply to or None if the server
+            pushed it, oldest first. A request that failed gets an "error" event.
+        :round_trips: Seconds from sending a request to getting its reply, the latest ones by event type.
+        :resume_token: The latest resume token sent by the server, None until the player is seated.
+        :resume_room: Key of the room the resume token is for.
+    """
+
+    def __init__(self, uri: str = SERVER_URI):
+        self.uri = uri
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="connection", daemon=True)
+        self.websocket: websockets.WebSocketClientProtocol = None
+        self.received: collections.deque[tuple[dict | None, dict]] = collections.deque(maxlen=256)
+        self.round_trips: dict[str, collections.deque[float]] = collections.defaultdict(
+            lambda: collections.deque(maxlen=PERF_HISTORY)
+        )
+        self.resume_token: str = None
+        self.resume_room: str = None
+
+        self._connected: concurrent.futures.Future | asyncio.Future = None
+        self._reader: asyncio.Task = None
+        self._pending: list[tuple[tuple[str, ...], asyncio.Future, dict]] = []
+        # whether the connection is being closed on purpose, rather than dropped
+        self._closing = False
+
+    def start(self) -> None:
+        """Start the background event loop and open the connection, without waiting for it to be open."""
+        self.thread.start()
+        self._connected = asyncio.run_coroutine_threadsafe(self._connect(), self.loop)
+
+    def close(self) -> None:
+        """Close the connection and stop the background event loop."""
+        self._closing = True
+        if self.websocket is not None:
+            asyncio.run_coroutine_threadsafe(self.websocket.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def send(self, event: dict) -> None:
+        """Send an event from any thread without waiting, its reply is queued in `received`."""
+        asyncio.run_coroutine_threadsafe(self._send(event), self.loop)
+
+    def _opening(self) -> concurrent.futures.Future | asyncio.Future:
+        """The opening of the connection, started again if it failed or if it was closed with no seat to resume."""
+        connected = self._connected
+        if connected.done() and (connected.cancelled() or connected.exception() is not None
+                                 or self.websocket is None or self.websocket.closed):
+            self._connected = asyncio.ensure_future(self._connect())
+        return self._connected
+
+    async def _connect(self) -> None:
+        self.websocket = await websockets.connect(self.uri)
+        self._reader = asyncio.create_task(self._read())
+
+    async def _reconnect(self, uri: str) -> None:
+        """Move the connection to another worker of the server."""
+        self._closing = True
+        await self.websocket.close()
+        await self._reader
+        self._closing = False
+        self.uri = uri
+        await self._connect()
+
+    async def _resume(self) -> None:
+        """Open a new connection after the previous one dropped, and take back the seat held by the server."""
+        deadline = time.monotonic() + RESUME_GRACE
+        delay = 0.25
+        try:
+            while True:
+                try:
+                    await self._connect()
+                    break
+                except OSError:
+                    # the server may be restarting, it is tried again until the seat is no longer held
+                    if time.monotonic() + delay > deadline:
+                        raise
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 4)
+            # the shared port may lead to another worker than the one holding the room, it redirects to it
+            await self._request({"type": "resume", "player": None, "token": self.resume_token,
+                                 "room": self.resume_room})
+        except (ConnectionError, OSError) as e:
+            self.resume_token = None
+            self.received.append((None, {"type": "error", "message": f"connection to the server lost: {e}"}))
+
+    async def _send(self, event: dict) -> None:
+        try:
+            # the requests sent while the connection is being opened wait for it
+            await asyncio.wrap_future(self._opening())
+            await self._request(event)
+        except (ConnectionError, OSError) as e:
+            self.received.append((event, {"type": "error", "message": f"connection to the server failed: {e}"}))
+
+    async def _request(self, event: dict) -> None:
+        start = time.perf_counter()
+        while True:
+            waiter = (REPLY_TYPES.get(event["type"], ()), self.loop.create_future(), event)
+            self._pending.append(waiter)
+            try:
+                await self.websocket.send(encode_json(event))
+                reply = await waiter[1]
+            except websockets.exceptions.ConnectionClosed as e:
+                raise ConnectionError("connection to the server closed") from e
+            finally:
+                self._pending.remove(waiter)
+
+            if reply["type"] != "redirect":
+                self.round_trips[event["type"]].append(time.perf_counter() - start)
+                return
+            # the room is held by another worker of the server, the event is sent again to it
+            await self._reconnect(reply["uri"])
+
+    async def _read(self) -> None:
+        """Queue every received event with the oldest request waiting for it, or as a pushed event."""
+        try:
+            async for message in self.websocket:
+                event = decode_json(message)
+                if event["type"] in ("session", "resumed"):
+                    self.resume_token, self.resume_room = event["resume"], event["room"]
+                elif event["type"] == "room_closed":
+                    self.resume_token = self.resume_room = None
+                for reply_types, future, request in self._pending:
+                    if not future.done() and (event["type"] in reply_types or event["type"] in ("error", "redirect")):
+                        future.set_result(event)
+                        # the reply is queued here rather than by its request, to keep the order of arrival
+                        if event["type"] != "redirect":
+                            self.received.append((request, event))
+                        break
+                else:
+                    self.received.append((None, event))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            for _, future, _ in self._pending:
+                if not future.done():
+                    future.set_exception(ConnectionError("connection to the server closed"))
+            if not self._closing and self.resume_token is not None:
+                # the connection dropped, the requests sent from now wait for the seat to be taken back
+                self._connected = asyncio.ensure_future(self._resume())
@@ -0,0 +1,52 @@
+"""Contains the colors and styles shared by the views, and the batches their background is drawn with."""
+
+import arcade
+import arcade.gui
+
+FONT_COLOR_WHITE = (255, 255, 255)
+FONT_COLOR_RED = (255, 0, 0)
+STYLE_WHITE = {"font_name": "Dilo World", "font_color": FONT_COLOR_WHITE, "bg_color": (202, 201, 202),
+               "border_color": (119, 117, 119)}
+
+STYLE_RED = {"font_name": "Dilo World", "font_color": FONT_COLOR_RED, "bg_color": (202, 201, 202),
+             "border_color": (119, 117, 119)}
+
+STYLE_OPTION = {**STYLE_WHITE, "font_name": "Quadratum Unum", "font_size": 16}
+
+
+BACKPLATE_COLOR = (202, 201, 202)
+
+
+def draw_background(main_window: arcade.Window, name: str) -> bool:
+    """Draw a background over the whole window, returns False while its texture is still being decoded."""
+    background = main_window.assets.background(name)
+    if background is None:
+        return False
+    background.draw()
+    return True
+
+
+class Backplates:
+    """
+    Filled rectangles drawn behind some widgets in one batch, it is only built again when the widgets move or resize.
+
+    :param color: Color of the rectangles.
+    """
+
+    def __init__(self, color: arcade.Color = BACKPLATE_COLOR):
+        self.color = color
+
+        self._rects: tuple = ()
+        self._shapes: arcade.ShapeElementList = None
+
+    def draw(self, widgets: list[arcade.gui.UIWidget]) -> None:
+        """Draw a rectangle behind every widget of `widgets`, where they were last laid out."""
+        rects = tuple(tuple(widget.rect) for widget in widgets)
+        if rects != self._rects:
+            self._rects = rects
+            self._shapes = arcade.ShapeElementList()
+            for x, y, width, height in rects:
+                self._shapes.append(arcade.create_rectangle_filled(x + width / 2, y + height / 2, width, height,
+                                                                   self.color))
+        if self._rects:
+            self._shapes.draw()
@@ -1,121 +1,135 @@
-import asyncio
-import json
+"""
+Contains the views of a game, from joining a room to its decision.
+
+They are imported once the play button of the menu is first clicked, with the networking they need.
+"""
+
+import collections
+import contextlib
+import csv
 import time
-import webbrowser
-from functools import partial
-from random import randint
 
 import arcade
 import arcade.gui
-import nest_asyncio
-import websockets
-import websockets.exceptions
 
+from chemistry import Reaction, reaction_by_key
 from config import (
-    ASSET_PATH, MAX_ROUNDS, ROOM_SIZE, SCREEN_HEIGHT, SCREEN_WIDTH,
-    WAITING_SECOND
+    MAX_ROUNDS, PERF_CSV_PATH, PERF_HISTORY, PERF_REFRESH, ROOM_SIZE
+)
+from protocol import StateMirror
+from window.menu import Menu
+from window.style import (
+    FONT_COLOR_RED, FONT_COLOR_WHITE, STYLE_OPTION, STYLE_WHITE, Backplates,
+    draw_background
 )
 
-nest_asyncio.apply()
-
-FONT_COLOR_WHITE = (255, 255, 255)
-FONT_COLOR_RED = (255, 0, 0)
-STYLE_WHITE = {"font_name": "Dilo World", "font_color": FONT_COLOR_WHITE, "bg_color": (202, 201, 202),
-               "border_color": (119, 117, 119)}
-
-STYLE_RED = {"font_name": "Dilo World", "font_color": FONT_COLOR_RED, "bg_color": (202, 201, 202),
-             "border_color": (119, 117, 119)}
 
-MENU_BACKGROUND = arcade.load_texture(str(ASSET_PATH / "backgrounds" / "menu_bg.jpg"), width=SCREEN_WIDTH,
-                                      height=SCREEN_HEIGHT)
+def set_label_text(label: arcade.gui.UILabel, text: str) -> None:
+    """Set the text of a label and fit it, a label is only laid out and rendered again if its text changed."""
+    if label.text != text:
+        label.text = text
+        label.fit_content()
 
-GAME_BACKGROUND = arcade.load_texture(str(ASSET_PATH / "backgrounds" / "game_bg.jpg"))
 
-arcade.load_font(str(ASSET_PATH / "fonts" / "DiloWorld-mLJLv.ttf"))
-arcade.load_font(str(ASSET_PATH / "fonts" / "QuadratumUnum-LW0Z.ttf"))
+def back_to_menu(view: arcade.View) -> None:
+    """Leave the views of a game for the menu, e.g. once the server closed the room."""
+    if view.manager:
+        view.manager.disable()
+    view.main_window.show_view(Menu(view.main_window))
 
 
-def encode_json(message) -> str:
-    """Helper function ( dict -> str of json )"""
-    return json.dumps(message, ensure_ascii=False)
+def percentile(samples, percent: float) -> float:
+    """Value under which `percent` percent of the samples are, 0 if there are none."""
+    samples = sorted(samples)
+    if not samples:
+        return 0
+    return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
 
 
-def decode_json(message) -> dict:
-    """Helper function ( str of json -> dict )"""
-    return json.loads(message)
+class PerformanceOverlay:
+    """
+    Frame rate, frame times, time spent handling the events of the server and round trip times, drawn over a view.
 
+    The frame rate and the time spent drawing and updating the frames come from the timings of arcade, they are
+    enabled the first time the overlay is shown. The time spent handling the events received is recorded by
+    `network_callbacks`, the round trips by the connection itself.
 
-class Menu(arcade.View):
-    """
-    Menu view.
+    :param main_window: Main window in which the overlay is shown.
 
-    :param main_window: Main window in which the view is shown.
+    Attributes:
+        :visible: Whether the overlay is drawn.
+        :network_times: Seconds the latest frames spent handling the events received from the server.
     """
 
     def __init__(self, main_window: arcade.Window):
-        super().__init__(main_window)
         self.main_window = main_window
+        self.visible = False
+        self.network_times: collections.deque[float] = collections.deque(maxlen=PERF_HISTORY)
+
+        self._text: arcade.Text = None
+        self._refreshed = 0.0
+
+    def toggle(self) -> None:
+        """Show the overlay, or hide it if it is shown."""
+        if not arcade.timings_enabled():
+            arcade.enable_timings(PERF_HISTORY)
+        self.visible = not self.visible
+        self._refreshed = 0.0
+
+    @contextlib.contextmanager
+    def network_callbacks(self):
+        """Time the handling of the events received from the server in a frame."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.network_times.append(time.perf_counter() - start)
+
+    def measures(self) -> dict[str, float]:
+        """Every measure of the overlay by name, the times are in milliseconds."""
+        measures = {}
+        if arcade.timings_enabled():
+            measures["fps"] = arcade.get_fps()
+            timings = arcade.get_timings()
+            for name in ("on_draw", "on_update"):
+                for percent in (50, 95, 99):
+                    measures[f"{name}_p{percent}_ms"] = percentile(timings.get(name, ()), percent) * 1000
+        for percent in (50, 95):
+            measures[f"network_callbacks_p{percent}_ms"] = percentile(self.network_times, percent) * 1000
+        measures["network_callbacks_max_ms"] = max(self.network_times, default=0) * 1000
+        connection = self.main_window.connection
+        if connection is not None:
+            for event_type, round_trips in sorted(connection.round_trips.items()):
+                # copied first, the connection records round trips on its own thread
+                round_trips = list(round_trips)
+                measures[f"rtt_{event_type}_p50_ms"] = percentile(round_trips, 50) * 1000
+                measures[f"rtt_{event_type}_p95_ms"] = percentile(round_trips, 95) * 1000
+        return measures
+
+    def draw(self) -> None:
+        """Draw the measures if the overlay is shown, its text is only laid out again every PERF_REFRESH seconds."""
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if now - self._refreshed >= PERF_REFRESH:
+            self._refreshed = now
+            text = "\n".join(f"{name} {value:.1f}" for name, value in self.measures().items())
+            if self._text is None:
+                self._text = arcade.Text(text, 10, self.main_window.height - 10, arcade.color.BLACK, font_size=10,
+                                         width=300, multiline=True, anchor_y="top")
+            else:
+                self._text.text = text
+        self._text.draw()
 
-        self.v_box = None
-        self.v_box_heading = None
-
-        self.manager = None
-
-    def on_show_view(self) -> None:
-        """Called when the current is switched to this view."""
-        self.setup()
-
-    def setup(self) -> None:
-        """Set up the game variables. Call to re-start the game."""
-        self.v_box = arcade.gui.UIBoxLayout(space_between=30)
-        self.v_box_heading = arcade.gui.UIBoxLayout()
-        self.manager = arcade.gui.UIManager()
-        self.manager.enable()
-
-        play_button = arcade.gui.UIFlatButton(text="PLAY", width=200, style=STYLE_WHITE)
-        play_button.on_click = self._on_click_play_button
-        create_lobby_button = arcade.gui.UIFlatButton(text="Create Lobby", width=200, style=STYLE_WHITE)
-        create_lobby_button.on_click = self._on_click_play_button
-        dummy_play_button = arcade.gui.UIFlatButton(text="Play", width=200, style=STYLE_RED)
-        dummy_play_button.on_click = self._on_click_dummy_play_button
-
-        self.v_box.add(play_button)
-        self.v_box.add(create_lobby_button)
-        self.v_box.add(dummy_play_button)
-
-        self.manager.add(
-            arcade.gui.UIAnchorWidget(
-                child=self.v_box
-            )
-        )
-
-    def on_draw(self) -> None:
-        """Called when this view should draw."""
-        self.clear()
-
-        arcade.draw_lrwh_rectangle_textured(0, 0,
-                                            SCREEN_WIDTH, SCREEN_HEIGHT,
-                                            MENU_BACKGROUND)
-        self.manager.draw()
-
-    def _on_click_dummy_play_button(self, _: arcade.gui.UIOnClickEvent) -> None:
-        """
-        Do one of three things when the dummy play button is pressed.
-
-        [0] Open a URL using the `webbrowser` module. (The same module used by `import antigravity`)
-        [1] Close the window and exit python.
-        [2] Do both.
-        """
-        if (picked := randint(0, 2)) != 1:
-            webbrowser.open_new("https://youtu.be/fujCdB93fpw")
-        if picked:
-            self.main_window.close()
-            arcade.exit()
-            raise SystemExit
-
-    def _on_click_play_button(self, _: arcade.gui.UIOnClickEvent) -> None:
-        waiting_screen = WaitingScreen(self.main_window)
-        self.main_window.show_view(waiting_screen)
+    def write_csv(self, path=PERF_CSV_PATH) -> None:
+        """Append every measure to a csv file, one row per measure with the time it was written at."""
+        new = not path.exists()
+        with open(path, "a", newline="") as file:
+            writer = csv.writer(file)
+            if new:
+                writer.writerow(("time", "measure", "value"))
+            now = time.time()
+            writer.writerows((f"{now:.3f}", name, f"{value:.3f}") for name, value in self.measures().items())
 
 
 class WaitingScreen(arcade.View):
@@ -134,15 +148,17 @@ class WaitingScreen(arcade.View):
         self.manager = None
 
         self.name_input_box = None
+        # the backplate of the name input box, drawn in one batch
+        self.backplates = Backplates()
 
         self.client_id = None
         self.client_data = None
         self.room_key = None
+        # whether our join was sent, the clicks are ignored until it fails
+        self.joining = False
 
         self.all_player_ids = None
 
-        self.lambda_client = None
-
     def on_show_view(self) -> None:
         """Called once when the view is shown."""
         self.setup()
@@ -174,56 +190,44 @@ class WaitingScreen(arcade.View):
         """Called when this view should draw."""
         self.clear()
 
-        arcade.draw_lrwh_rectangle_textured(0, 0,
-                                            SCREEN_WIDTH, SCREEN_HEIGHT,
-                                            MENU_BACKGROUND)
-        arcade.draw_rectangle_filled(self.name_input_box.x + 125, self.name_input_box.y + 10,
-                                     250, 20, (202, 201, 202))
+        draw_background(self.main_window, "menu_background")
+        self.backplates.draw([self.name_input_box])
         self.manager.draw()
 
+    def on_update(self, delta_time: float) -> None:
+        """Handle the replies and the room updates received from the server since the last frame."""
+        for request, event in self.main_window.received(self):
+            if request is not None:
+                # the reply to our join tells us who we are and in which room
+                self.client_id = event.get("player", self.client_id)
+                self.room_key = event.get("room", self.room_key)
+            self.on_server_event(event)
+
     def _on_click_find_players_button(self, _: arcade.gui.UIOnClickEvent):
+        if self.joining:
+            return
+        self.joining = True
         join_event = {
             "type": "join",
             "player": self.client_id,
-            "auto_disconnect": True,
             "player_name": self.name_input_box.text,
         }
 
-        asyncio.run(self.client(join_event))
-        room_status_event = {
-            "type": "room_status",
-            "player": self.client_id,
-            "auto_disconnect": True,
-            "room": self.room_key
-        }
-
-        self.lambda_client = lambda _: asyncio.run(self.client(room_status_event))
-
-        arcade.schedule(self.lambda_client, 3)
-
-    async def client(self, event):
-        """Client side for the waiting screen."""
-        async with websockets.connect("ws://localhost:8001") as ws:
-            try:
-                await ws.send(encode_json(event))
-                msg = await ws.recv()
-                event = decode_json(msg)
-                self.client_id = event.get("player", self.client_id)
-                self.room_key = event.get("room", self.room_key)
-
-                num_players = int(event.get("length", 0))
-                client_data = event.get("client_data", 0)
-
-                if num_players == ROOM_SIZE:
-                    self.client_data = client_data
-                    arcade.unschedule(self.lambda_client)
-                    game = Game(self.main_window, self.client_data, self.name_input_box.text, self.client_id,
-                                self.room_key)
-                    self.main_window.show_view(game)
-                    return
+        self.main_window.get_connection().send(join_event)
 
-            except websockets.exceptions.ConnectionClosedOK as e:
-                print(e)
+    def on_server_event(self, event: dict) -> None:
+        """The game is started once the server tells us the room is full."""
+        if event["type"] == "reply_room_status" and event["length"] == ROOM_SIZE:
+            self.client_data = event["client_data"]
+            game = Game(self.main_window, self.client_data, self.name_input_box.text, self.client_id,
+                        self.room_key)
+            self.main_window.show_view(game)
+        elif event["type"] == "room_closed" and event["room"] == self.room_key:
+            back_to_menu(self)
+        elif event["type"] == "error":
+            print(event["message"])
+            # the player can try again unless they are already seated
+            self.joining = self.room_key is not None
 
 
 class Game(arcade.View):
@@ -244,13 +248,23 @@ class Game(arcade.View):
         self.room_id = room_id
 
         self.reaction = {}
+        # the state of the room, from the snapshot and the deltas sent by the server
+        self.state = StateMirror()
+        self.seat: int = None
+        self.reaction_round: int = None
+        # whether the changes since our state were asked for and did not arrive yet
+        self.resyncing = False
 
         self.v_box = None
         self.v_box_top = None
         self.h_box_top = None
         self.manager = None
 
-        self.name_labels = []
+        self.name_labels: list[arcade.gui.UILabel] = []
+        # the backplates of the name labels, drawn in one batch
+        self.backplates = Backplates()
+        self.options_box: arcade.gui.UIBoxLayout = None
+        self.option_buttons: list[arcade.gui.UIFlatButton] = []
         self.round_label: arcade.gui.UILabel = None
         self.current_turn: arcade.gui.UILabel = None
         self.current_label: arcade.gui.UILabel = None
@@ -262,37 +276,27 @@ class Game(arcade.View):
         self.round = 1
         self.turn_index = 0
 
-        self.lambda_client = None
-
         self.rounds_won = 0
 
+        self.overlay = PerformanceOverlay(main_window)
+
     def on_show_view(self):
         """Called when the current is switched to this view."""
         event = {
             "type": "get_reaction_pub",
             "player": self.player_id,
-            "auto_disconnect": True,
             "room": self.room_id
         }
-        asyncio.run(self.client(event))
-
-        time.sleep(0.5)
+        self.request(event)
 
-    def get_turn(self):
-        """Will schedule to send a type "turn_status_pub" event to the server."""
-        if self.turn_index != self.reaction['index']:
-            event = {
-                "type": "turn_status_pub",
-                "player": self.player_id,
-                "room": self.room_id,
-                "auto_disconnect": True,
-            }
-
-            self.lambda_client = lambda _: asyncio.run(self.client(event))
-            arcade.schedule(self.lambda_client, WAITING_SECOND // 3)
+    def on_update(self, delta_time: float) -> None:
+        """Handle the replies, turns and reactions received from the server since the last frame."""
+        with self.overlay.network_callbacks():
+            for _, event in self.main_window.received(self):
+                self.on_server_event(event)
 
     def setup(self):
-        """Set up the game variables. Call to re-start the game."""
+        """Build the widgets of the game once, `update_widgets` then changes only the text that changed."""
         self.player_names = tuple(self.all_player_data.values())
 
         self.manager = arcade.gui.UIManager()
@@ -300,46 +304,34 @@ class Game(arcade.View):
 
         self.h_box_top = arcade.gui.UIBoxLayout(vertical=False, space_between=200)
         # switch font color to red just to test if it's working
-        self.round_label = arcade.gui.UILabel(text=f"Round {self.round} of {MAX_ROUNDS}", text_color=FONT_COLOR_RED,
-                                              font_name="Dilo World")
+        self.round_label = arcade.gui.UILabel(text="", text_color=FONT_COLOR_RED, font_name="Dilo World")
         self.h_box_top.add(self.round_label)
         # self.h_box_top.add(reaction_label)
 
         self.v_box_top = arcade.gui.UIBoxLayout(space_between=20)
         self.reaction_label = arcade.gui.UILabel(
-            text=f"Recipe is: {self.reaction['reaction']}",
+            text="",
             width=450,
             text_color=FONT_COLOR_RED,
             font_size=24,
             height=50,
             font_name="Quadratum Unum",
         )
-        self.reaction_label.fit_content()
-        v_box_h_box = arcade.gui.UIBoxLayout(vertical=False)
-        for option in self.reaction['options']:
-            mod_style = STYLE_WHITE
-            mod_style["font_name"] = "Quadratum Unum"
-            mod_style["font_size"] = 16
-            option_method = partial(self._on_click_option, option=option)
-            options_button = arcade.gui.UIFlatButton(text=option, width=250 / 4, style=mod_style)
-            options_button.on_click = option_method
-            v_box_h_box.add(options_button)
-
-        self.current_turn = arcade.gui.UILabel(text=f"{self.player_names[self.turn_index]}'s Turn",
-                                               font_name="Dilo World", text_color=FONT_COLOR_RED, width=250, height=30)
-        self.current_turn.fit_content()
+        self.options_box = arcade.gui.UIBoxLayout(vertical=False)
+
+        self.current_turn = arcade.gui.UILabel(text="", font_name="Dilo World", text_color=FONT_COLOR_RED, width=250,
+                                               height=30)
 
         self.current_label = arcade.gui.UILabel(
-            text=f"Current reaction is: {self.reaction['current_reaction']}",
+            text="",
             width=300,
             text_color=FONT_COLOR_RED,
             font_size=16,
             height=50,
             font_name="Quadratum Unum",
         )
-        self.current_label.fit_content()
         self.v_box_top.add(self.reaction_label)
-        self.v_box_top.add(v_box_h_box)
+        self.v_box_top.add(self.options_box)
         self.v_box_top.add(self.current_turn)
         self.v_box_top.add(self.current_label)
 
@@ -381,25 +373,49 @@ class Game(arcade.View):
             )
         )
 
+    def update_widgets(self) -> None:
+        """Show the round, the reaction, its options and the turn, only the widgets whose text changed are redrawn."""
+        set_label_text(self.round_label, f"Round {self.round} of {MAX_ROUNDS}")
+        set_label_text(self.reaction_label, f"Recipe is: {self.reaction['reaction']}")
+        set_label_text(self.current_turn, f"{self.player_names[self.turn_index]}'s Turn")
+        set_label_text(self.current_label, f"Current reaction is: {self.reaction['current_reaction']}")
+
+        # the buttons are kept from one reaction to the next, they are only added when there are more options
+        options = self.reaction['options']
+        while len(self.option_buttons) < len(options):
+            options_button = arcade.gui.UIFlatButton(width=250 / 4, style=STYLE_OPTION)
+            options_button.on_click = self._on_click_option
+            self.option_buttons.append(options_button)
+        if len(self.options_box.children) != len(options):
+            self.options_box.clear()
+            for options_button in self.option_buttons[:len(options)]:
+                self.options_box.add(options_button)
+        for options_button, option in zip(self.option_buttons, options):
+            if options_button.text != option:
+                options_button.text = option
+
     def on_draw(self):
         """Called when this view should draw."""
         self.clear()
 
-        arcade.draw_lrwh_rectangle_textured(0, 0,
-                                            SCREEN_WIDTH, SCREEN_HEIGHT,
-                                            GAME_BACKGROUND)
-
-        for label in self.name_labels:
-            arcade.draw_rectangle_filled(label.x + label.width / 2, label.y + label.height / 2,
-                                         label.width, label.height, (202, 201, 202))
+        draw_background(self.main_window, "game_background")
+        self.backplates.draw(self.name_labels)
 
         if self.manager:
             self.manager.draw()
+        self.overlay.draw()
+
+    def on_key_press(self, symbol: int, modifiers: int) -> None:
+        """F3 shows or hides the performance overlay, F4 appends its numbers to PERF_CSV_PATH."""
+        if symbol == arcade.key.F3:
+            self.overlay.toggle()
+        elif symbol == arcade.key.F4:
+            self.overlay.write_csv()
 
-    def _on_click_option(self, _: arcade.gui.UIOnClickEvent, option):
+    def _on_click_option(self, event: arcade.gui.UIOnClickEvent):
         if self.reaction["index"] != self.turn_index:
             return
-        self.option = option
+        self.option = event.source.text
         mod_reactants = self.reaction['reactants'].copy()
         plus_index = mod_reactants.index(" ")
         mod_reactants.remove(" ")
@@ -416,115 +432,100 @@ class Game(arcade.View):
             "player": self.player_id,
             "room": self.room_id,
             "turn": self.turn_index,
-            "auto_disconnect": True,
             "index": self.reaction['index'],
         }
 
-        asyncio.run(self.client(event))
+        self.request(event)
 
     def round_check(self):
-        """Called to check how many rounds have been played and perform action according to it."""
+        """Called once the round we played is over, the decision is shown once the game is over."""
+        state = self.state.fields
         self.option = None
-        if self.reaction['reaction_original'] == self.reaction['current_reaction']:
-            self.rounds_won += 1
+        self.round = state['round'] + 1
+        self.rounds_won = state['won']
 
-        if self.round - 1 == MAX_ROUNDS:
-            arcade.unschedule(self.lambda_client)
+        if state['state'] == "finished":
             if self.rounds_won >= 2:
                 decision = Decision(self.main_window, "THE PATIENT SURVIVED!")
             else:
                 decision = Decision(self.main_window, "YOU KILLED THE PATIENT")
             self.main_window.show_view(decision)
 
-    async def client(self, event):
-        """Client side for the waiting screen."""
-        async with websockets.connect("ws://localhost:8001") as ws:
-            try:
-                await ws.send(encode_json(event))
-                msg = await ws.recv()
-                event_recv = decode_json(msg)
-                print(event_recv)
-                match event["type"]:
-                    case "get_reaction_pub":
-                        self.reaction['reaction_original'] = event_recv['reaction_original']
-                        self.reaction['reaction'] = event_recv['reaction']
-                        self.reaction['reactants'] = event_recv['reactants']
-                        self.reaction['products'] = event_recv["products"]
-                        self.reaction['options'] = event_recv['options']
-                        self.reaction['index'] = event_recv['index']
-                        self.reaction["current_reaction"] = event_recv["reaction"]
-                        if self.manager:
-                            self.manager.clear()
-                        self.setup()
-                        self.get_turn()
-                    case "select_option_pub":
-                        event = {
-                            "type": "turn_status_pub",
-                            "player": self.player_id,
-                            "room": self.room_id,
-                            "auto_disconnect": True,
-                        }
-                        if event_recv['turn'] == 0:
-                            self.round += 1
-                            self.round_check()
-                            event = {
-                                "type": "get_reaction_pub",
-                                "player": self.player_id,
-                                "auto_disconnect": True,
-                                "room": self.room_id
-                            }
-                            self.turn_index = event_recv['turn']
-                            asyncio.run(self.client(event))
-                            return
-
-                        self.turn_index = event_recv['turn']
-                        self.current_turn.text = f"{self.player_names[event_recv['turn']]}'s Turn"
-                        self.current_turn.fit_content()
-
-                        self.current_label.text = f"Current reaction is: {self.reaction['current_reaction']}"
-                        self.current_label.fit_content()
-
-                        self.lambda_client = lambda _: asyncio.run(self.client(event))
-                        arcade.schedule(self.lambda_client, WAITING_SECOND // 3)
-                    case "turn_status_pub":
-                        # round end
-                        if event_recv['turn'] < self.turn_index:
-                            self.round += 1
-                            self.round_check()
-
-                            event = {
-                                "type": "get_reaction_pub",
-                                "player": self.player_id,
-                                "auto_disconnect": True,
-                                "room": self.room_id
-                            }
-                            self.turn_index = event_recv['turn']
-                            asyncio.run(self.client(event))
-
-                        elif event_recv['turn'] == self.reaction['index']:
-                            arcade.unschedule(self.lambda_client)
-                            self.reaction["current_reaction"] = event_recv["reaction"]
-                            self.turn_index = event_recv['turn']
-
-                            self.manager.clear()
-                            self.setup()
-
-                        elif event_recv['turn'] != self.reaction['index']:
-                            self.turn_index = event_recv['turn']
-                            self.reaction['current_reaction'] = event_recv['reaction'].replace("XX", self.option
-                                                                                               or "XX")
-
-                            self.current_turn.text = f"{self.player_names[self.turn_index]}'s Turn"
-                            self.current_turn.fit_content()
-
-                            self.current_label.text = f"Current reaction is: {self.reaction['current_reaction']}"
-                            self.current_label.fit_content()
-
-                    case _:
-                        pass
-
-            except Exception as e:
-                print(e)
+    def set_reaction(self) -> None:
+        """Start a round with the reaction of the room state."""
+        state = self.state.fields
+        reaction = self.catalog_reaction()
+        self.seat = self.state.seat(self.player_id)
+        self.reaction_round = state['round']
+        self.reaction['reaction_original'] = reaction.reaction
+        self.reaction['reaction'] = reaction.omit(self.seat)
+        self.reaction['reactants'] = list(reaction.reactants)
+        self.reaction['products'] = reaction.product
+        self.reaction['options'] = reaction.options(self.seat, state['variant'])
+        self.reaction['index'] = self.seat
+        self.reaction["current_reaction"] = self.current_reaction()
+        self.turn_index = state['turn']
+        if self.manager is None:
+            self.setup()
+        self.update_widgets()
+
+    def catalog_reaction(self) -> Reaction:
+        """The reaction of the round, the server only sends its key in the catalog."""
+        return reaction_by_key(self.state.fields['reaction'])
+
+    def current_reaction(self) -> str:
+        """The reaction as filled in so far, our reactant is hidden until we pick it."""
+        reaction = self.catalog_reaction()
+        parts = list(reaction.parts)
+        for position, part in self.state.fields['parts'].items():
+            parts[int(position)] = part
+        if self.state.fields['turn'] <= self.seat:
+            return reaction.omit(self.seat, parts)
+        return reaction.fill(parts)
+
+    def on_server_event(self, event: dict) -> None:
+        """Update the game from an event sent by the server."""
+        match event["type"]:
+            case "state" | "state_delta":
+                if not self.state.apply(event):
+                    # some deltas were missed, the server sends the changes since the state we have, once
+                    if not self.resyncing:
+                        self.resyncing = True
+                        self.request({"type": "turn_status_pub", "player": self.player_id, "room": self.room_id,
+                                      "seq": self.state.seq})
+                    return
+                self.resyncing = False
+
+                state = self.state.fields
+                if self.reaction_round is not None and (state['round'] != self.reaction_round
+                                                        or state['state'] == "finished"):
+                    # the round we played is over, the turn that completed it may be merged into this state, e.g.
+                    # after a resync or a resume
+                    self.round_check()
+                if state['reaction'] is None:
+                    return
+                if state['round'] != self.reaction_round:
+                    self.set_reaction()
+                    return
+
+                self.turn_index = state['turn']
+                self.reaction['current_reaction'] = self.current_reaction()
+
+                if self.turn_index == ROOM_SIZE:
+                    # every player has picked, the reaction of the next round follows unless it was the last round
+                    return
+
+                self.update_widgets()
+            case "room_closed" if event["room"] == self.room_id:
+                back_to_menu(self)
+            case "error":
+                print(event["message"])
+            case _:
+                pass
+
+    def request(self, event: dict) -> None:
+        """Send an event without waiting, its reply is handled by `on_server_event` in a later frame."""
+        self.main_window.get_connection().send(event)
 
 
 class Decision(arcade.View):
@@ -563,8 +564,6 @@ class Decision(arcade.View):
         """Called when this view should draw."""
         self.clear()
 
-        arcade.draw_lrwh_rectangle_textured(0, 0,
-                                            SCREEN_WIDTH, SCREEN_HEIGHT,
-                                            GAME_BACKGROUND)
+        draw_background(self.main_window, "game_background")
 
         self.manager.draw()
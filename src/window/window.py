@@ -1,16 +1,73 @@
+from typing import TYPE_CHECKING, Iterator
+
 import arcade
 
-from config import ASSET_PATH
+from window.assets import Assets
+
+if TYPE_CHECKING:
+    from window.network import Connection
 
 
 class Window(arcade.Window):
-    """Main application class."""
+    """
+    Main application class.
+
+    :param exit_after_first_frame: Print when the first frame is drawn and close the window, to time the startup.
+    """
 
-    def __init__(self, width, height, title):
+    def __init__(self, width, height, title, exit_after_first_frame: bool = False):
         super().__init__(width, height, title)
 
         arcade.set_background_color(arcade.color.ANTI_FLASH_WHITE)
 
-        self.music = arcade.Sound(str(ASSET_PATH / "music" / "game_bg.wav"))
-        self.music_player = self.music.play(loop=True, volume=0.1)
-        self.music_player.seek(90)
+        # the textures are decoded in the background while the first frames are drawn
+        self.assets = Assets()
+        self.assets.preload()
+        self.exit_after_first_frame = exit_after_first_frame
+        self.first_frame_drawn = False
+
+        self.connection: "Connection" = None
+
+    def get_connection(self) -> "Connection":
+        """Return the connection to the server of this session, opening it on first use."""
+        if self.connection is None:
+            # websockets is only imported once the player looks for a game
+            from window.network import Connection
+
+            self.connection = Connection()
+            self.connection.start()
+        return self.connection
+
+    def received(self, view: arcade.View) -> Iterator[tuple[dict | None, dict]]:
+        """
+        Take the (request, event) received by the connection since the last frame, see `Connection.received`.
+
+        The events stop as soon as `view` is no longer shown, the ones left are for the view that replaced it.
+        """
+        connection = self.connection
+        while connection is not None and connection.received and self.current_view is view:
+            yield connection.received.popleft()
+
+    def show_view(self, new_view: arcade.View):
+        """Show a view, the fonts its text uses are added before the first one."""
+        self.assets.load_fonts()
+        super().show_view(new_view)
+
+    def on_draw(self):
+        """Called after the current view has drawn, the music starts once the first frame is on screen."""
+        if self.first_frame_drawn:
+            return
+        self.first_frame_drawn = True
+        if self.exit_after_first_frame:
+            print("first frame drawn", flush=True)
+            self.close()
+            arcade.exit()
+            return
+        self.assets.play_music()
+
+    def on_close(self):
+        """Called when the window is closed."""
+        if self.connection is not None:
+            self.connection.close()
+        self.assets.close()
+        super().on_close()